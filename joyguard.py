@@ -15,7 +15,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
 
-from joyguard_app.database import db
+from joyguard_app.database import get_db
 from joyguard_app.memory import (
     build_user_memory_context,
     choose_varied_entries,
@@ -25,7 +25,7 @@ from joyguard_app.memory import (
     schedule_memory_capture,
     store_chat_history,
 )
-from joyguard_app.openrouter import call_openrouter
+from joyguard_app.openrouter import call_openrouter, close_openrouter_session
 from joyguard_app.styles import (
     add_saved_style,
     delete_saved_style,
@@ -51,7 +51,6 @@ from joyguard_app.settings import (
     CHAT_HISTORY_LIMIT,
     CHAT_MEMORY_CONTEXT_LIMIT,
     CHAT_MEMORY_DB_LIMIT,
-    CHAT_MEMORY_MESSAGE_CHAR_LIMIT,
     CUSTOM_STYLE_KEY,
     CUSTOM_STYLE_MIN_LENGTH,
     CUSTOM_STYLE_PROMPT_LIMIT,
@@ -139,7 +138,7 @@ async def generate_ai_reply(
             saved_id = extract_saved_style_id(style_key)
             saved_style = get_saved_style(owner_id, saved_id)
             if saved_style:
-                return style_key, saved_style["prompt"]
+                return style_key, saved_style.prompt
             logger.warning("Сохранённый стиль %s пользователя %s не найден — откатываюсь.", style_key, owner_id)
             set_user_style(owner_id, DEFAULT_AI_STYLE)
             return resolve_style(owner_id, allow_default=True)
@@ -173,13 +172,6 @@ async def generate_ai_reply(
     return await call_openrouter(messages)
 
 
-def summarize_message_text(message: types.Message) -> str:
-    text = (message.text or message.caption or "").strip()
-    if text:
-        return text[:CHAT_MEMORY_MESSAGE_CHAR_LIMIT]
-    return f"<{message.content_type}>"
-
-
 def normalize_message_text(value: str | None) -> str | None:
     if not value:
         return None
@@ -187,18 +179,6 @@ def normalize_message_text(value: str | None) -> str | None:
     return normalized.lower() if normalized else None
 
 
-def choose_varied_entries(entries: list[str], limit: int) -> list[str]:
-    if limit <= 0 or len(entries) <= limit:
-        return entries
-    recent_keep = entries[:max(MEMORY_MIN_RECENT_SHARE, min(limit // 2, len(entries)))]
-    remaining = entries[len(recent_keep):]
-    to_pick = limit - len(recent_keep)
-    if remaining and to_pick > 0:
-        sampled = random.sample(remaining, min(to_pick, len(remaining)))
-        recent_keep += sampled
-    return recent_keep
-
-
 def is_echo_of_bot_message(message: types.Message) -> bool:
     if not message.reply_to_message or not BOT_ID:
         return False
@@ -335,7 +315,7 @@ async def ensure_group_subscription(message: types.Message) -> bool:
 
 
 def build_support_admin_keyboard(user_id: int) -> InlineKeyboardMarkup:
-    ban_info = db.get_support_ban(user_id) or {"block_media": False, "block_all": False}
+    ban_info = get_db().get_support_ban(user_id) or {"block_media": False, "block_all": False}
     media_text = "🚫 Запретить медиа" if not ban_info["block_media"] else "♻️ Разрешить медиа"
     full_text = "⛔️ Полный бан" if not ban_info["block_all"] else "♻️ Разрешить пользователя"
     return InlineKeyboardMarkup(inline_keyboard=[
@@ -364,9 +344,9 @@ async def send_temp_answer(message: types.Message, text: str, *, delay: int = 20
 def record_user_profiles_from_message(message: types.Message):
     """Сохранить информацию об участвующих пользователях для поиска по username."""
     if message.from_user:
-        db.upsert_user_profile(message.from_user)
+        get_db().upsert_user_profile(message.from_user)
     if message.reply_to_message and message.reply_to_message.from_user:
-        db.upsert_user_profile(message.reply_to_message.from_user)
+        get_db().upsert_user_profile(message.reply_to_message.from_user)
 
 
 def extract_mentioned_usernames(message: types.Message) -> list[str]:
@@ -411,7 +391,7 @@ def gather_targets_from_message(message: types.Message) -> list[dict]:
     # Адресат из ответа
     if message.reply_to_message and message.reply_to_message.from_user:
         target_user = message.reply_to_message.from_user
-        db.upsert_user_profile(target_user)
+        get_db().upsert_user_profile(target_user)
         add_target(target_user.id, target_user.first_name, target_user.username)
 
     def process_entities(text: str | None, entities: list[types.MessageEntity] | None):
@@ -419,18 +399,18 @@ def gather_targets_from_message(message: types.Message) -> list[dict]:
             return
         for entity in entities:
             if entity.type == "text_mention" and entity.user:
-                db.upsert_user_profile(entity.user)
+                get_db().upsert_user_profile(entity.user)
                 add_target(entity.user.id, entity.user.first_name, entity.user.username)
             elif entity.type == "mention":
                 mention_text = text[entity.offset: entity.offset + entity.length]
                 if mention_text.startswith("@"):
                     username = mention_text[1:]
-                    profile = db.get_user_by_username(username)
+                    profile = get_db().get_user_by_username(username)
                     if profile:
                         add_target(
-                            profile["user_id"],
-                            profile.get("first_name"),
-                            profile.get("username")
+                            profile.user_id,
+                            profile.first_name,
+                            profile.username
                         )
                     else:
                         add_target(None, mention_text, username)
@@ -461,11 +441,11 @@ async def process_swear_stats(message: types.Message):
         swear_count = count_swears_in_text(joined_text)
         if swear_count > 0:
             record_user_profiles_from_message(message)
-            db.increment_swear(message.chat.id, message.from_user.id, swear_count)
+            get_db().increment_swear(message.chat.id, message.from_user.id, swear_count)
 
 
 async def send_swear_ranking(message: types.Message):
-    ranking = db.get_swear_ranking(message.chat.id, SWEAR_RANK_ENTRIES)
+    ranking = get_db().get_swear_ranking(message.chat.id, SWEAR_RANK_ENTRIES)
     if not ranking:
         await message.answer("📊 В этом чате пока нет данных по матам.")
         return
@@ -492,7 +472,7 @@ async def get_chat_user_name(chat_id: int, user_id: int) -> str:
 
 
 async def send_block_profile(message: types.Message, target_user_id: int, title_name: str | None = None):
-    blocked_ids = db.get_blocks_by_blocker(message.chat.id, target_user_id)
+    blocked_ids = get_db().get_blocks_by_blocker(message.chat.id, target_user_id)
     display_name = title_name or await get_chat_user_name(message.chat.id, target_user_id)
     text_lines = [
         f"📊 Профиль блокировок: {display_name}",
@@ -511,7 +491,7 @@ async def send_block_profile(message: types.Message, target_user_id: int, title_
 
 
 async def send_block_ranking(message: types.Message):
-    blocks = db.get_chat_blocks(message.chat.id)
+    blocks = get_db().get_chat_blocks(message.chat.id)
     if not blocks:
         await message.answer("📋 В этом чате нет активных блокировок.")
         return
@@ -580,7 +560,7 @@ async def resolve_targets_with_fetch(chat_id: int, targets: list[dict]):
         target["user_id"] = resolved_user.id
         target["name"] = resolved_user.first_name or getattr(resolved_user, "full_name", None) or target.get("name") or username_with_at
         target["username"] = resolved_user.username or username
-        db.upsert_user_profile(resolved_user)
+        get_db().upsert_user_profile(resolved_user)
 
 # ==================== Обработчики команд ====================
 
@@ -681,12 +661,12 @@ async def cmd_joy_stop(message: types.Message):
     tail_lower = text_lower[cmd_pos:].lstrip()
 
     # Обработка режима "Спринг стоп все"
-    global_block_enabled, global_block_message = db.get_global_block(message.chat.id, blocker_id)
+    global_block_enabled, global_block_message = get_db().get_global_block(message.chat.id, blocker_id)
 
     if tail_lower.startswith("спринг стоп все"):
         remaining_text = text[cmd_pos + len("спринг стоп все"):]
         global_message = extract_personal_message(remaining_text, targets)
-        enabled = db.toggle_global_block(message.chat.id, blocker_id, global_message)
+        enabled = get_db().toggle_global_block(message.chat.id, blocker_id, global_message)
         blocker_name = message.from_user.first_name
         if enabled:
             if global_message:
@@ -729,7 +709,7 @@ async def cmd_joy_stop(message: types.Message):
 
     # Если включен "Спринг стоп все", то команда работает как исключение
     if global_block_enabled:
-        allowed = db.toggle_global_block_exception(message.chat.id, blocker_id, blocked_id)
+        allowed = get_db().toggle_global_block_exception(message.chat.id, blocker_id, blocked_id)
         blocker_name = message.from_user.first_name
         if allowed:
             response = (
@@ -743,7 +723,7 @@ async def cmd_joy_stop(message: types.Message):
         return
 
     # Переключаем блокировку
-    is_blocked = db.toggle_block(
+    is_blocked = get_db().toggle_block(
         message.chat.id,
         blocker_id,
         blocked_id,
@@ -810,9 +790,12 @@ async def maybe_reply_with_ai(
     if targets is None:
         targets = gather_targets_from_message(message)
 
-    history_entries = get_chat_history_entries(message.chat.id)
-    chat_memories = db.get_chat_memories(message.chat.id, CHAT_MEMORY_CONTEXT_LIMIT)
-    user_memory_context = build_user_memory_context(message.chat.id, targets)
+    history_entries = get_chat_history_entries(message.chat.id, CHAT_HISTORY_LIMIT)
+    # Both lookups read SQLite; run them side by side off the event loop.
+    chat_memories, user_memory_context = await asyncio.gather(
+        asyncio.to_thread(get_db().get_chat_memories, message.chat.id, CHAT_MEMORY_CONTEXT_LIMIT),
+        asyncio.to_thread(build_user_memory_context, message.chat.id, targets),
+    )
     reply_text = await generate_ai_reply(
         message,
         history_entries,
@@ -841,7 +824,7 @@ async def check_reply_block(message: types.Message):
 
     record_user_profiles_from_message(message)
     targets = gather_targets_from_message(message)
-    schedule_memory_capture(message, targets)
+    await schedule_memory_capture(message, targets)
 
     await maybe_reply_with_ai(message, targets)
 
@@ -859,14 +842,14 @@ async def check_reply_block(message: types.Message):
         if not target_id:
             continue
 
-        global_block_enabled, global_block_message = db.get_global_block(message.chat.id, target_id)
-        if global_block_enabled and not db.is_global_block_exception(message.chat.id, target_id, replier_id):
+        global_block_enabled, global_block_message = get_db().get_global_block(message.chat.id, target_id)
+        if global_block_enabled and not get_db().is_global_block_exception(message.chat.id, target_id, replier_id):
             blocked_target = target
             blocker_id = target_id
             personal_message = global_block_message
             break
 
-        is_blocked, personal_msg = db.is_blocked(message.chat.id, target_id, replier_id)
+        is_blocked, personal_msg = get_db().is_blocked(message.chat.id, target_id, replier_id)
         if is_blocked:
             blocked_target = target
             blocker_id = target_id
@@ -879,7 +862,7 @@ async def check_reply_block(message: types.Message):
     try:
         await message.delete()
 
-        autoresponder = personal_message or db.get_global_autoresponder(blocker_id)
+        autoresponder = personal_message or get_db().get_global_autoresponder(blocker_id)
         if not autoresponder:
             autoresponder = "Пользователь установил ограничение на ответы к своим сообщениям."
 
@@ -911,7 +894,7 @@ async def global_autoresponder_menu(message: types.Message, state: FSMContext):
     # Очищаем любое предыдущее состояние
     await state.clear()
     
-    current = db.get_global_autoresponder(message.from_user.id)
+    current = get_db().get_global_autoresponder(message.from_user.id)
     
     text = "✍️ Глобальный автоответчик\n\n"
     if current:
@@ -946,7 +929,7 @@ async def save_global_autoresponder(message: types.Message, state: FSMContext):
         await message.answer("❌ Отменено.", reply_markup=get_main_keyboard())
         return
     
-    db.set_global_autoresponder(message.from_user.id, message.text)
+    get_db().set_global_autoresponder(message.from_user.id, message.text)
     await state.clear()
     await message.answer(
         "✅ Глобальный автоответчик успешно установлен!",
@@ -966,8 +949,8 @@ async def open_saved_styles_menu(callback: types.CallbackQuery):
     lines = ["💾 Твои сохранённые стили:"]
     if styles:
         for style in styles:
-            mark = " (активен)" if style["id"] == active_id else ""
-            lines.append(f"• {style['name']}{mark}")
+            mark = " (активен)" if style.id == active_id else ""
+            lines.append(f"• {style.name}{mark}")
     else:
         lines.append("Пока пусто. Нажми '➕ Новый стиль', чтобы сохранить первый пресет.")
 
@@ -1013,7 +996,7 @@ async def saved_style_activate(callback: types.CallbackQuery):
         return
     set_user_style(user_id, f"{SAVED_STYLE_PREFIX}{style_id}", saved_style_id=style_id)
     await refresh_style_menu_message(callback.message, user_id)
-    await callback.answer(f"Стиль '{style['name']}' активирован")
+    await callback.answer(f"Стиль '{style.name}' активирован")
 
 
 @dp.callback_query(F.data.startswith("style_saved_del_"))
@@ -1034,7 +1017,7 @@ async def saved_style_delete(callback: types.CallbackQuery):
         if current == f"{SAVED_STYLE_PREFIX}{style_id}":
             set_user_style(user_id, DEFAULT_AI_STYLE)
         await refresh_style_menu_message(callback.message, user_id)
-        await callback.answer(f"Стиль '{style['name']}' удалён")
+        await callback.answer(f"Стиль '{style.name}' удалён")
     else:
         await callback.answer("Не удалось удалить", show_alert=True)
 
@@ -1090,7 +1073,7 @@ async def handle_saved_style_prompt(message: types.Message, state: FSMContext):
         return
 
     style = add_saved_style(user_id, name, prompt)
-    set_user_style(user_id, f"{SAVED_STYLE_PREFIX}{style['id']}", saved_style_id=style["id"])
+    set_user_style(user_id, f"{SAVED_STYLE_PREFIX}{style.id}", saved_style_id=style.id)
     await state.clear()
     await message.answer(
         f"✅ Стиль '{name}' сохранён и активирован!",
@@ -1138,7 +1121,7 @@ async def save_support_message(message: types.Message, state: FSMContext):
         await message.answer("❌ Отменено.", reply_markup=get_main_keyboard())
         return
     
-    ban_info = db.get_support_ban(message.from_user.id)
+    ban_info = get_db().get_support_ban(message.from_user.id)
     if ban_info and ban_info["block_all"]:
         await message.answer(
             "",
@@ -1152,7 +1135,7 @@ async def save_support_message(message: types.Message, state: FSMContext):
         return
 
     # Проверка антиспама
-    can_send, wait_time = db.can_send_support_message(message.from_user.id, cooldown_seconds=30)
+    can_send, wait_time = get_db().can_send_support_message(message.from_user.id, cooldown_seconds=30)
     if not can_send:
         await message.answer(
             f"⏰ Пожалуйста, подождите {wait_time} сек. перед отправкой следующего сообщения.",
@@ -1163,7 +1146,7 @@ async def save_support_message(message: types.Message, state: FSMContext):
 
     # Сохраняем в БД
     stored_text = message.text or message.caption or f"<{message.content_type}>"
-    db.save_support_message(message.from_user.id, stored_text)
+    get_db().save_support_message(message.from_user.id, stored_text)
 
     # Отправляем администратору, если ID указан
     if ADMIN_ID:
@@ -1272,16 +1255,16 @@ def build_saved_styles_keyboard(user_id: int) -> InlineKeyboardMarkup:
     active_id = get_active_saved_style_id(user_id)
     rows: list[list[InlineKeyboardButton]] = []
     for style in styles:
-        mark = " ✅" if style["id"] == active_id else ""
+        mark = " ✅" if style.id == active_id else ""
         rows.append(
             [
                 InlineKeyboardButton(
-                    text=f"{style['name']}{mark}",
-                    callback_data=f"style_saved_use_{style['id']}"
+                    text=f"{style.name}{mark}",
+                    callback_data=f"style_saved_use_{style.id}"
                 ),
                 InlineKeyboardButton(
                     text="🗑",
-                    callback_data=f"style_saved_del_{style['id']}"
+                    callback_data=f"style_saved_del_{style.id}"
                 )
             ]
         )
@@ -1305,9 +1288,9 @@ def build_style_menu_view(user_id: int) -> tuple[str, InlineKeyboardMarkup]:
         saved_id = extract_saved_style_id(personal)
         saved = get_saved_style(user_id, saved_id)
         if saved:
-            snippet = saved["prompt"].strip()
+            snippet = saved.prompt.strip()
             preview = (snippet[:120] + "…") if len(snippet) > 120 else snippet
-            status_text = f"Твой личный стиль: � {saved['name']}.\nОписание: {preview}"
+            status_text = f"Твой личный стиль: � {saved.name}.\nОписание: {preview}"
         else:
             status_text = "Твой личный стиль: 💾 (не найден). Использую стиль бота."
     elif personal:
@@ -1468,7 +1451,7 @@ async def toggle_support_media(callback: types.CallbackQuery):
         return
 
     user_id = int(callback.data.split("_")[-1])
-    new_state = db.toggle_support_media_ban(user_id)
+    new_state = get_db().toggle_support_media_ban(user_id)
     text = "Медиа запрещены" if new_state else "Медиа снова разрешены"
     await callback.answer(text)
     await callback.message.edit_reply_markup(reply_markup=build_support_admin_keyboard(user_id))
@@ -1493,7 +1476,7 @@ async def toggle_support_full(callback: types.CallbackQuery):
         return
 
     user_id = int(callback.data.split("_")[-1])
-    new_state = db.toggle_support_full_ban(user_id)
+    new_state = get_db().toggle_support_full_ban(user_id)
     text = "Пользователь заблокирован в поддержке" if new_state else "Пользователь снова может писать"
     await callback.answer(text)
     await callback.message.edit_reply_markup(reply_markup=build_support_admin_keyboard(user_id))
@@ -1511,7 +1494,10 @@ async def init_bot_identity():
 async def main():
     logger.info("Запуск JoyGuard...")
     await init_bot_identity()
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await close_openrouter_session()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
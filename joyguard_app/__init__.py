@@ -1,14 +1,25 @@
 """JoyGuard modular package."""
 
+from typing import Any
+
 from . import settings
-from .database import Database, db
+from .database import Database, SavedStyle, UserRef, get_db
 from .settings import bot, dp, logger
 
 __all__ = [
     "Database",
+    "SavedStyle",
+    "UserRef",
     "bot",
     "db",
     "dp",
+    "get_db",
     "logger",
     "settings",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,337 +2,638 @@
 
 from __future__ import annotations
 
-import json
+import atexit
+import queue
 import sqlite3
+import threading
 import time
-from datetime import datetime
-from typing import Any
-
-from .settings import CHAT_MEMORY_DB_LIMIT, CHAT_MEMORY_MESSAGE_CHAR_LIMIT
+from collections import Counter, OrderedDict, defaultdict
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Final, NamedTuple
+
+from .settings import (
+    CHAT_MEMORY_DB_LIMIT,
+    CHAT_MEMORY_MESSAGE_CHAR_LIMIT,
+    CHAT_MEMORY_PRUNE_INTERVAL,
+    DB_READ_POOL_SIZE,
+    DB_WRITE_FLUSH_INTERVAL,
+    PROFILE_CACHE_SIZE,
+    SETTINGS_CACHE_SIZE,
+    SWEAR_FLUSH_INTERVAL,
+    logger,
+)
+
+# Schema ----------------------------------------------------------------
+# WAL is switched on separately in init_db: in-memory databases cannot use it.
+_PRAGMAS: Final[str] = """
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-65536;
+    PRAGMA busy_timeout=30000;
+    PRAGMA mmap_size=268435456;
+"""
+
+# Lookup indexes follow the tables. blocks needs none: its
+# UNIQUE(chat_id, blocker_id, blocked_id) already covers the read helpers.
+_SCHEMA: Final[str] = """
+    CREATE TABLE IF NOT EXISTS blocks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        blocker_id INTEGER NOT NULL,
+        blocked_id INTEGER NOT NULL,
+        personal_message TEXT,
+        created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+        UNIQUE(chat_id, blocker_id, blocked_id)
+    );
+    CREATE TABLE IF NOT EXISTS global_autoresponders (
+        user_id INTEGER PRIMARY KEY,
+        message TEXT NOT NULL,
+        updated_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+    );
+    CREATE TABLE IF NOT EXISTS support_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        message TEXT NOT NULL,
+        created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+    );
+    CREATE TABLE IF NOT EXISTS support_bans (
+        user_id INTEGER PRIMARY KEY,
+        block_media INTEGER NOT NULL DEFAULT 0,
+        block_all INTEGER NOT NULL DEFAULT 0,
+        updated_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+    );
+    CREATE TABLE IF NOT EXISTS global_blocks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        blocker_id INTEGER NOT NULL,
+        message TEXT,
+        created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+        UNIQUE(chat_id, blocker_id)
+    );
+    CREATE TABLE IF NOT EXISTS global_block_exceptions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        blocker_id INTEGER NOT NULL,
+        allowed_id INTEGER NOT NULL,
+        created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+        UNIQUE(chat_id, blocker_id, allowed_id)
+    );
+    CREATE TABLE IF NOT EXISTS last_support_time (
+        user_id INTEGER PRIMARY KEY,
+        last_message_time INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS user_profiles (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        username_lower TEXT,
+        first_name TEXT,
+        last_name TEXT,
+        updated_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+    );
+    CREATE TABLE IF NOT EXISTS swear_stats (
+        chat_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (chat_id, user_id)
+    );
+    CREATE TABLE IF NOT EXISTS chat_memories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        message_id INTEGER,
+        author_id INTEGER,
+        author_name TEXT,
+        summary TEXT NOT NULL,
+        created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+    );
+    CREATE TABLE IF NOT EXISTS user_memories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        subject_user_id INTEGER NOT NULL,
+        source_user_id INTEGER,
+        note TEXT NOT NULL,
+        created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+    );
+    CREATE TABLE IF NOT EXISTS chat_settings (
+        chat_id INTEGER NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT,
+        updated_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+        PRIMARY KEY (chat_id, key)
+    );
+    CREATE TABLE IF NOT EXISTS user_settings (
+        user_id INTEGER NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT,
+        updated_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+        PRIMARY KEY (user_id, key)
+    );
+    CREATE TABLE IF NOT EXISTS chat_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        subject_user_id INTEGER NOT NULL,
+        source_user_id INTEGER,
+        note TEXT NOT NULL,
+        created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+    );
+    CREATE TABLE IF NOT EXISTS ai_styles (
+        user_id INTEGER PRIMARY KEY,
+        style TEXT NOT NULL,
+        updated_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+    );
+    CREATE TABLE IF NOT EXISTS saved_styles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        prompt TEXT NOT NULL,
+        created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+    );
+    CREATE INDEX IF NOT EXISTS ix_chat_memories_chat_id_id
+        ON chat_memories(chat_id, id DESC);
+    CREATE INDEX IF NOT EXISTS ix_user_memories_lookup
+        ON user_memories(chat_id, subject_user_id, id DESC);
+    CREATE INDEX IF NOT EXISTS ix_saved_styles_user
+        ON saved_styles(user_id, id);
+    CREATE INDEX IF NOT EXISTS ix_swear_stats_chat_count
+        ON swear_stats(chat_id, count DESC, user_id);
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_user_profiles_username_lower
+        ON user_profiles(username_lower) WHERE username_lower IS NOT NULL;
+"""
+
+# Settings --------------------------------------------------------------
+_SQL_GET_CHAT_SETTING: Final[str] = "SELECT value FROM chat_settings WHERE chat_id = ? AND key = ?"
+
+_SQL_SET_CHAT_SETTING: Final[str] = """
+    INSERT INTO chat_settings (chat_id, key, value, updated_at)
+    VALUES (?, ?, ?, CAST(strftime('%s', 'now') AS INTEGER))
+    ON CONFLICT(chat_id, key) DO UPDATE SET
+        value = excluded.value,
+        updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+"""
+
+_SQL_DELETE_CHAT_SETTING: Final[str] = "DELETE FROM chat_settings WHERE chat_id = ? AND key = ?"
+
+_SQL_GET_USER_SETTING: Final[str] = "SELECT value FROM user_settings WHERE user_id = ? AND key = ?"
+
+_SQL_SET_USER_SETTING: Final[str] = """
+    INSERT INTO user_settings (user_id, key, value, updated_at)
+    VALUES (?, ?, ?, CAST(strftime('%s', 'now') AS INTEGER))
+    ON CONFLICT(user_id, key) DO UPDATE SET
+        value = excluded.value,
+        updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+"""
+
+_SQL_DELETE_USER_SETTING: Final[str] = "DELETE FROM user_settings WHERE user_id = ? AND key = ?"
+
+_SQL_GET_USER_SETTINGS: Final[str] = "SELECT key, value FROM user_settings WHERE user_id = ?"
+
+# Saved styles ----------------------------------------------------------
+_SQL_GET_SAVED_STYLES: Final[str] = (
+    "SELECT id, name, prompt, created_at FROM saved_styles WHERE user_id = ? ORDER BY id"
+)
+
+_SQL_GET_SAVED_STYLE: Final[str] = (
+    "SELECT id, name, prompt, created_at FROM saved_styles WHERE user_id = ? AND id = ?"
+)
+
+_SQL_ADD_SAVED_STYLE: Final[str] = (
+    "INSERT INTO saved_styles (user_id, name, prompt) VALUES (?, ?, ?)"
+)
+
+_SQL_DELETE_SAVED_STYLE: Final[str] = "DELETE FROM saved_styles WHERE user_id = ? AND id = ?"
+
+# Memories --------------------------------------------------------------
+_SQL_ADD_CHAT_MEMORY: Final[str] = """
+    INSERT INTO chat_memories (chat_id, message_id, author_id, author_name, summary)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+_SQL_PRUNE_CHAT_MEMORIES: Final[str] = """
+    DELETE FROM chat_memories
+    WHERE chat_id = ? AND id <= (
+        SELECT id FROM chat_memories WHERE chat_id = ?
+        ORDER BY id DESC LIMIT 1 OFFSET ?
+    )
+"""
+
+_SQL_GET_CHAT_MEMORIES: Final[str] = (
+    "SELECT summary FROM chat_memories WHERE chat_id = ? ORDER BY id DESC LIMIT ?"
+)
+
+_SQL_ADD_USER_MEMORY: Final[str] = """
+    INSERT INTO user_memories (chat_id, subject_user_id, source_user_id, note)
+    VALUES (?, ?, ?, ?)
+"""
+
+_SQL_GET_USER_MEMORIES: Final[str] = """
+    SELECT note FROM user_memories
+    WHERE chat_id = ? AND subject_user_id = ?
+    ORDER BY id DESC LIMIT ?
+"""
+
+# Formatted with one "?" per user id; ordering matches _SQL_GET_USER_MEMORIES.
+_SQL_GET_USER_MEMORIES_BULK: Final[str] = """
+    SELECT subject_user_id, note FROM (
+        SELECT subject_user_id, note,
+            ROW_NUMBER() OVER (PARTITION BY subject_user_id ORDER BY id DESC) AS rn
+        FROM user_memories
+        WHERE chat_id = ? AND subject_user_id IN ({placeholders})
+    )
+    WHERE rn <= ?
+    ORDER BY subject_user_id, rn
+"""
+
+# Blocks ----------------------------------------------------------------
+_SQL_INSERT_BLOCK: Final[str] = """
+    INSERT INTO blocks (chat_id, blocker_id, blocked_id, personal_message)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(chat_id, blocker_id, blocked_id) DO NOTHING
+    RETURNING id
+"""
+
+_SQL_DELETE_BLOCK: Final[str] = """
+    DELETE FROM blocks
+    WHERE chat_id = ? AND blocker_id = ? AND blocked_id = ?
+"""
+
+_SQL_GET_BLOCK_MESSAGE: Final[str] = """
+    SELECT personal_message FROM blocks
+    WHERE chat_id = ? AND blocker_id = ? AND blocked_id = ?
+"""
+
+_SQL_GET_CHAT_BLOCKS: Final[str] = "SELECT blocker_id, blocked_id FROM blocks WHERE chat_id = ?"
+
+_SQL_GET_BLOCKS_BY_BLOCKER: Final[str] = (
+    "SELECT blocked_id FROM blocks WHERE chat_id = ? AND blocker_id = ?"
+)
+
+_SQL_INSERT_GLOBAL_BLOCK: Final[str] = """
+    INSERT INTO global_blocks (chat_id, blocker_id, message) VALUES (?, ?, ?)
+    ON CONFLICT(chat_id, blocker_id) DO NOTHING
+    RETURNING id
+"""
+
+_SQL_CLEAR_GLOBAL_BLOCK_EXCEPTIONS: Final[str] = (
+    "DELETE FROM global_block_exceptions WHERE chat_id = ? AND blocker_id = ?"
+)
+
+_SQL_DELETE_GLOBAL_BLOCK: Final[str] = (
+    "DELETE FROM global_blocks WHERE chat_id = ? AND blocker_id = ?"
+)
+
+_SQL_GET_GLOBAL_BLOCK: Final[str] = (
+    "SELECT message FROM global_blocks WHERE chat_id = ? AND blocker_id = ?"
+)
+
+_SQL_INSERT_GLOBAL_BLOCK_EXCEPTION: Final[str] = """
+    INSERT INTO global_block_exceptions (chat_id, blocker_id, allowed_id)
+    VALUES (?, ?, ?)
+    ON CONFLICT(chat_id, blocker_id, allowed_id) DO NOTHING
+    RETURNING id
+"""
+
+_SQL_DELETE_GLOBAL_BLOCK_EXCEPTION: Final[str] = """
+    DELETE FROM global_block_exceptions
+    WHERE chat_id = ? AND blocker_id = ? AND allowed_id = ?
+"""
+
+_SQL_IS_GLOBAL_BLOCK_EXCEPTION: Final[str] = """
+    SELECT 1 FROM global_block_exceptions
+    WHERE chat_id = ? AND blocker_id = ? AND allowed_id = ?
+"""
+
+# Profiles --------------------------------------------------------------
+_SQL_UPSERT_USER_PROFILE: Final[str] = """
+    INSERT INTO user_profiles (user_id, username, username_lower, first_name, last_name, updated_at)
+    VALUES (?, ?, ?, ?, ?, CAST(strftime('%s', 'now') AS INTEGER))
+    ON CONFLICT(user_id) DO UPDATE SET
+        username = excluded.username,
+        username_lower = excluded.username_lower,
+        first_name = excluded.first_name,
+        last_name = excluded.last_name,
+        updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+"""
+
+_SQL_GET_USER_BY_USERNAME: Final[str] = (
+    "SELECT user_id, first_name, username FROM user_profiles WHERE username_lower = ?"
+)
+
+# Support ---------------------------------------------------------------
+_SQL_GET_LAST_SUPPORT_TIME: Final[str] = (
+    "SELECT last_message_time FROM last_support_time WHERE user_id = ?"
+)
+
+_SQL_CLAIM_SUPPORT_SLOT: Final[str] = """
+    INSERT INTO last_support_time (user_id, last_message_time) VALUES (?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        last_message_time = excluded.last_message_time
+    WHERE excluded.last_message_time - last_message_time >= ?
+    RETURNING last_message_time
+"""
+
+_SQL_SAVE_SUPPORT_MESSAGE: Final[str] = (
+    "INSERT INTO support_messages (user_id, message) VALUES (?, ?)"
+)
+
+_SQL_GET_SUPPORT_BAN: Final[str] = (
+    "SELECT block_media, block_all FROM support_bans WHERE user_id = ?"
+)
+
+_SQL_SET_SUPPORT_BAN: Final[str] = """
+    INSERT INTO support_bans (user_id, block_media, block_all)
+    VALUES (:user_id, COALESCE(:block_media, 0), COALESCE(:block_all, 0))
+    ON CONFLICT(user_id) DO UPDATE SET
+        block_media = COALESCE(:block_media, block_media),
+        block_all = COALESCE(:block_all, block_all),
+        updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+    RETURNING block_media, block_all
+"""
+
+_SQL_TOGGLE_SUPPORT_MEDIA_BAN: Final[str] = """
+    INSERT INTO support_bans (user_id, block_media, block_all)
+    VALUES (?, 1, 0)
+    ON CONFLICT(user_id) DO UPDATE SET
+        block_media = NOT block_media,
+        updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+    RETURNING block_media
+"""
+
+_SQL_TOGGLE_SUPPORT_FULL_BAN: Final[str] = """
+    INSERT INTO support_bans (user_id, block_media, block_all)
+    VALUES (?, 0, 1)
+    ON CONFLICT(user_id) DO UPDATE SET
+        block_all = NOT block_all,
+        updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+    RETURNING block_all
+"""
+
+# Stats -----------------------------------------------------------------
+_SQL_INCREMENT_SWEAR: Final[str] = """
+    INSERT INTO swear_stats (chat_id, user_id, count)
+    VALUES (?, ?, ?)
+    ON CONFLICT(chat_id, user_id) DO UPDATE SET
+        count = count + excluded.count
+"""
+
+_SQL_GET_SWEAR_RANKING: Final[str] = """
+    SELECT user_id, count FROM swear_stats
+    WHERE chat_id = ?
+    ORDER BY count DESC, user_id ASC
+    LIMIT ?
+"""
+
+_MISSING = object()
+_first_column = itemgetter(0)
+
+
+class UserRef(NamedTuple):
+    user_id: int
+    first_name: str | None
+    username: str | None
+
+
+class SavedStyle(NamedTuple):
+    id: int
+    name: str
+    prompt: str
+    # Unix seconds; rows written before the INTEGER switch keep their text stamp.
+    created_at: int | str | None = None
+
+
+class _LRUCache:
+    """Bounded mapping that evicts the least recently used key."""
+
+    def __init__(self, maxsize: int) -> None:
+        self._data: OrderedDict[Any, Any] = OrderedDict()
+        self._maxsize = maxsize
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return default
+        return self._data[key]
+
+    def put(self, key: Any, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Any) -> None:
+        self._data.pop(key, None)
 
 
 class Database:
     def __init__(self, db_name: str = "joyguard.db") -> None:
         self.db_name = db_name
+        # All mutations go through one long-lived connection serialised by
+        # the RLock; SELECT helpers borrow from a pool of read-only
+        # connections so, under WAL, they never wait on the writer.
+        # Autocommit: single-statement writes need no BEGIN/COMMIT, and the
+        # few multi-statement ones open an explicit _transaction().
+        self._write_conn = sqlite3.connect(
+            db_name, check_same_thread=False, cached_statements=256, isolation_level=None
+        )
+        self._write_lock = threading.RLock()
+        self._read_pool: queue.SimpleQueue[sqlite3.Connection] = queue.SimpleQueue()
+        self._closed = False
+        self._memory_insert_counter: dict[int, int] = {}
+        # Setting reads are served from memory; every write goes through the
+        # helpers below, which update the cache under the write lock. Cache
+        # misses are read on the write connection too, so a fill can't race
+        # a concurrent write and cache a stale value.
+        self._chat_setting_cache = _LRUCache(SETTINGS_CACHE_SIZE)
+        self._user_setting_cache = _LRUCache(SETTINGS_CACHE_SIZE)
+        # Last profile written per user, so repeat messages skip the UPSERT.
+        self._profile_cache = _LRUCache(PROFILE_CACHE_SIZE)
+        # Per-message inserts are queued by statement and written in batches
+        # by a background thread, one transaction per flush.
+        self._pending: defaultdict[str, list[tuple[Any, ...]]] = defaultdict(list)
+        # Swear increments are summed per (chat_id, user_id) and only written
+        # every SWEAR_FLUSH_INTERVAL seconds, or on an explicit flush().
+        self._swear_buf: Counter[tuple[int, int]] = Counter()
+        self._flush_stop = threading.Event()
+        atexit.register(self.close)
         self.init_db()
+        self._open_read_pool()
+        self._flusher = threading.Thread(target=self._flush_loop, name="joyguard-db-writer", daemon=True)
+        self._flusher.start()
 
     def get_connection(self) -> sqlite3.Connection:
-        return sqlite3.connect(self.db_name)
-
-    def init_db(self) -> None:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS blocks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chat_id INTEGER NOT NULL,
-                blocker_id INTEGER NOT NULL,
-                blocked_id INTEGER NOT NULL,
-                personal_message TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(chat_id, blocker_id, blocked_id)
-            )
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS global_autoresponders (
-                user_id INTEGER PRIMARY KEY,
-                message TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS support_messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                message TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS support_bans (
-                user_id INTEGER PRIMARY KEY,
-                block_media INTEGER NOT NULL DEFAULT 0,
-                block_all INTEGER NOT NULL DEFAULT 0,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
+        """Return the write connection (kept for backward compatibility)."""
+        return self._write_conn
 
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS global_blocks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chat_id INTEGER NOT NULL,
-                blocker_id INTEGER NOT NULL,
-                message TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(chat_id, blocker_id)
-            )
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS global_block_exceptions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chat_id INTEGER NOT NULL,
-                blocker_id INTEGER NOT NULL,
-                allowed_id INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(chat_id, blocker_id, allowed_id)
-            )
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS last_support_time (
-                user_id INTEGER PRIMARY KEY,
-                last_message_time INTEGER NOT NULL
-            )
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS user_profiles (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                username_lower TEXT UNIQUE,
-                first_name TEXT,
-                last_name TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS swear_stats (
-                chat_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                count INTEGER NOT NULL DEFAULT 0,
-                PRIMARY KEY (chat_id, user_id)
-            )
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS chat_memories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chat_id INTEGER NOT NULL,
-                message_id INTEGER,
-                author_id INTEGER,
-                author_name TEXT,
-                summary TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS user_memories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chat_id INTEGER NOT NULL,
-                subject_user_id INTEGER NOT NULL,
-                source_user_id INTEGER,
-                note TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS chat_settings (
-                chat_id INTEGER NOT NULL,
-                key TEXT NOT NULL,
-                value TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (chat_id, key)
-            )
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS user_settings (
-                user_id INTEGER NOT NULL,
-                key TEXT NOT NULL,
-                value TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (user_id, key)
-            )
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS chat_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chat_id INTEGER NOT NULL,
-                subject_user_id INTEGER NOT NULL,
-                source_user_id INTEGER,
-                note TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS ai_styles (
-                user_id INTEGER PRIMARY KEY,
-                style TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
-
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS saved_styles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                name TEXT NOT NULL,
-                prompt TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
+    def _open_read_pool(self) -> None:
+        # An in-memory database is private to its connection, so reads there
+        # fall back to the write connection (see _read).
+        if self.db_name == ":memory:":
+            return
+        uri = Path(self.db_name).resolve().as_uri() + "?mode=ro"
+        for _ in range(DB_READ_POOL_SIZE):
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=256)
+            conn.executescript(_PRAGMAS)
+            self._read_pool.put(conn)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run the block as one BEGIN IMMEDIATE ... COMMIT on the write connection."""
+        with self._write_lock:
+            self._write_conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._write_conn
+            except BaseException:
+                self._write_conn.execute("ROLLBACK")
+                raise
+            self._write_conn.execute("COMMIT")
+
+    @contextmanager
+    def _read(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a read-only connection for the duration of the block."""
+        if self.db_name == ":memory:":
+            with self._write_lock:
+                yield self._write_conn
+            return
+        conn = self._read_pool.get()
+        try:
+            yield conn
+        finally:
+            self._read_pool.put(conn)
+
+    def close(self) -> None:
+        self._flush_stop.set()
+        with self._write_lock:
+            if self._closed:
+                return
+            self.flush()
+            self._closed = True
+            self._write_conn.execute("PRAGMA optimize")
+            self._write_conn.close()
+            while not self._read_pool.empty():
+                self._read_pool.get_nowait().close()
+
+    def flush(self) -> None:
+        """Write all queued inserts and buffered counters in a single transaction."""
+        self._flush(counters=True)
+
+    def _flush(self, *, counters: bool) -> None:
+        with self._write_lock:
+            swears = self._swear_buf if counters else None
+            if self._closed or not (self._pending or swears):
+                return
+            pending, self._pending = self._pending, defaultdict(list)
+            if swears:
+                self._swear_buf = Counter()
+            with self._transaction():
+                for sql, rows in pending.items():
+                    self._write_conn.executemany(sql, rows)
+                if swears:
+                    self._write_conn.executemany(
+                        _SQL_INCREMENT_SWEAR,
+                        [(chat_id, user_id, amount) for (chat_id, user_id), amount in swears.items()],
+                    )
+
+    def _flush_loop(self) -> None:
+        next_counter_flush = time.monotonic() + SWEAR_FLUSH_INTERVAL
+        while not self._flush_stop.wait(DB_WRITE_FLUSH_INTERVAL):
+            now = time.monotonic()
+            counters = now >= next_counter_flush
+            if counters:
+                next_counter_flush = now + SWEAR_FLUSH_INTERVAL
+            try:
+                self._flush(counters=counters)
+            except sqlite3.Error as exc:
+                logger.error("Failed to flush queued database writes: %s", exc)
+
+    def _enqueue_write(self, sql: str, params: tuple[Any, ...]) -> None:
+        with self._write_lock:
+            self._pending[sql].append(params)
 
-        conn.commit()
-        conn.close()
+    def init_db(self) -> None:
+        with self._write_lock:
+            # WAL lets readers run alongside the writer and, with NORMAL sync,
+            # drops the fsync from every commit.
+            if self.db_name != ":memory:":
+                self._write_conn.execute("PRAGMA journal_mode=WAL")
+            self._write_conn.executescript(_PRAGMAS + _SCHEMA)
 
     # Settings helpers -----------------------------------------------------
     def get_chat_setting(self, chat_id: int, key: str) -> str | None:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT value FROM chat_settings WHERE chat_id = ? AND key = ?",
-            (chat_id, key),
-        )
-        row = cursor.fetchone()
-        conn.close()
-        return row[0] if row else None
+        with self._write_lock:
+            cached = self._chat_setting_cache.get((chat_id, key), _MISSING)
+            if cached is not _MISSING:
+                return cached
+            row = self._write_conn.execute(_SQL_GET_CHAT_SETTING, (chat_id, key)).fetchone()
+            value = row[0] if row else None
+            self._chat_setting_cache.put((chat_id, key), value)
+            return value
 
     def set_chat_setting(self, chat_id: int, key: str, value: str) -> None:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO chat_settings (chat_id, key, value, updated_at)
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-            ON CONFLICT(chat_id, key) DO UPDATE SET
-                value = excluded.value,
-                updated_at = CURRENT_TIMESTAMP
-            """,
-            (chat_id, key, value),
-        )
-        conn.commit()
-        conn.close()
+        with self._write_lock:
+            self._write_conn.execute(_SQL_SET_CHAT_SETTING, (chat_id, key, value))
+            self._chat_setting_cache.put((chat_id, key), value)
+
+    def delete_chat_setting(self, chat_id: int, key: str) -> None:
+        with self._write_lock:
+            self._write_conn.execute(_SQL_DELETE_CHAT_SETTING, (chat_id, key))
+            self._chat_setting_cache.put((chat_id, key), None)
 
     def get_user_setting(self, user_id: int, key: str) -> str | None:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT value FROM user_settings WHERE user_id = ? AND key = ?",
-            (user_id, key),
-        )
-        row = cursor.fetchone()
-        conn.close()
-        return row[0] if row else None
+        with self._write_lock:
+            cached = self._user_setting_cache.get((user_id, key), _MISSING)
+            if cached is not _MISSING:
+                return cached
+            row = self._write_conn.execute(_SQL_GET_USER_SETTING, (user_id, key)).fetchone()
+            value = row[0] if row else None
+            self._user_setting_cache.put((user_id, key), value)
+            return value
 
     def set_user_setting(self, user_id: int, key: str, value: str) -> None:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO user_settings (user_id, key, value, updated_at)
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-            ON CONFLICT(user_id, key) DO UPDATE SET
-                value = excluded.value,
-                updated_at = CURRENT_TIMESTAMP
-            """,
-            (user_id, key, value),
-        )
-        conn.commit()
-        conn.close()
+        with self._write_lock:
+            self._write_conn.execute(_SQL_SET_USER_SETTING, (user_id, key, value))
+            self._user_setting_cache.put((user_id, key), value)
 
     def delete_user_setting(self, user_id: int, key: str) -> None:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "DELETE FROM user_settings WHERE user_id = ? AND key = ?",
-            (user_id, key),
-        )
-        conn.commit()
-        conn.close()
+        with self._write_lock:
+            self._write_conn.execute(_SQL_DELETE_USER_SETTING, (user_id, key))
+            self._user_setting_cache.put((user_id, key), None)
+
+    def get_user_settings_bulk(self, user_id: int, keys: tuple[str, ...]) -> dict[str, str | None]:
+        """Return several settings for one user, reading the table at most once."""
+        with self._write_lock:
+            values = {key: self._user_setting_cache.get((user_id, key), _MISSING) for key in keys}
+            if _MISSING not in values.values():
+                return values
+            # A user has a handful of rows, so one primary-key prefix scan
+            # beats a lookup per missing key.
+            stored = dict(self._write_conn.execute(_SQL_GET_USER_SETTINGS, (user_id,)).fetchall())
+            for key, value in values.items():
+                if value is _MISSING:
+                    values[key] = stored.get(key)
+                    self._user_setting_cache.put((user_id, key), values[key])
+            return values
 
     # Saved styles ---------------------------------------------------------
-    def get_saved_styles(self, user_id: int) -> list[dict[str, Any]]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, name, prompt, created_at FROM saved_styles WHERE user_id = ? ORDER BY id",
-            (user_id,),
-        )
-        rows = cursor.fetchall()
-        conn.close()
-        return [
-            {"id": row[0], "name": row[1], "prompt": row[2], "created_at": row[3]}
-            for row in rows
-        ]
-
-    def get_saved_style(self, user_id: int, style_id: int) -> dict[str, Any] | None:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, name, prompt, created_at FROM saved_styles WHERE user_id = ? AND id = ?",
-            (user_id, style_id),
-        )
-        row = cursor.fetchone()
-        conn.close()
-        if not row:
-            return None
-        return {"id": row[0], "name": row[1], "prompt": row[2], "created_at": row[3]}
-
-    def add_saved_style(self, user_id: int, name: str, prompt: str) -> dict[str, Any]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO saved_styles (user_id, name, prompt) VALUES (?, ?, ?)",
-            (user_id, name, prompt),
-        )
-        style_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return {"id": style_id, "name": name, "prompt": prompt}
+    def get_saved_styles(self, user_id: int) -> list[SavedStyle]:
+        with self._read() as conn:
+            rows = conn.execute(_SQL_GET_SAVED_STYLES, (user_id,)).fetchall()
+        return list(map(SavedStyle._make, rows))
+
+    def get_saved_style(self, user_id: int, style_id: int) -> SavedStyle | None:
+        with self._read() as conn:
+            row = conn.execute(_SQL_GET_SAVED_STYLE, (user_id, style_id)).fetchone()
+        return SavedStyle._make(row) if row else None
+
+    def add_saved_style(self, user_id: int, name: str, prompt: str) -> SavedStyle:
+        with self._write_lock:
+            style_id = self._write_conn.execute(_SQL_ADD_SAVED_STYLE, (user_id, name, prompt)).lastrowid
+        return SavedStyle(style_id, name, prompt)
 
     def delete_saved_style(self, user_id: int, style_id: int) -> bool:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "DELETE FROM saved_styles WHERE user_id = ? AND id = ?",
-            (user_id, style_id),
-        )
-        deleted = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return deleted
+        with self._write_lock:
+            return self._write_conn.execute(_SQL_DELETE_SAVED_STYLE, (user_id, style_id)).rowcount > 0
 
     # Memories -------------------------------------------------------------
     def add_chat_memory(
@@ -345,37 +646,25 @@ class Database:
     ) -> None:
         if not summary:
             return
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO chat_memories (chat_id, message_id, author_id, author_name, summary)
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            (chat_id, message_id, author_id, author_name, summary[:CHAT_MEMORY_MESSAGE_CHAR_LIMIT]),
-        )
-        cursor.execute(
-            """
-            DELETE FROM chat_memories
-            WHERE id NOT IN (
-                SELECT id FROM chat_memories WHERE chat_id = ? ORDER BY id DESC LIMIT ?
-            ) AND chat_id = ?
-            """,
-            (chat_id, CHAT_MEMORY_DB_LIMIT, chat_id),
-        )
-        conn.commit()
-        conn.close()
+        with self._write_lock:
+            self._enqueue_write(
+                _SQL_ADD_CHAT_MEMORY,
+                (chat_id, message_id, author_id, author_name, summary[:CHAT_MEMORY_MESSAGE_CHAR_LIMIT]),
+            )
+            # Trimming to CHAT_MEMORY_DB_LIMIT is amortised over several inserts;
+            # readers always use LIMIT, so a few extra rows are harmless.
+            inserted = self._memory_insert_counter.get(chat_id, 0) + 1
+            if inserted < CHAT_MEMORY_PRUNE_INTERVAL:
+                self._memory_insert_counter[chat_id] = inserted
+                return
+            self._memory_insert_counter[chat_id] = 0
+            self.flush()
+            self._write_conn.execute(_SQL_PRUNE_CHAT_MEMORIES, (chat_id, chat_id, CHAT_MEMORY_DB_LIMIT))
 
     def get_chat_memories(self, chat_id: int, limit: int) -> list[str]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT summary FROM chat_memories WHERE chat_id = ? ORDER BY id DESC LIMIT ?",
-            (chat_id, limit),
-        )
-        rows = cursor.fetchall()
-        conn.close()
-        return [row[0] for row in rows]
+        self.flush()
+        with self._read() as conn:
+            return list(map(_first_column, conn.execute(_SQL_GET_CHAT_MEMORIES, (chat_id, limit))))
 
     def add_user_memory(
         self,
@@ -386,32 +675,30 @@ class Database:
     ) -> None:
         if not note:
             return
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO user_memories (chat_id, subject_user_id, source_user_id, note)
-            VALUES (?, ?, ?, ?)
-            """,
+        self._enqueue_write(
+            _SQL_ADD_USER_MEMORY,
             (chat_id, subject_user_id, source_user_id, note[:CHAT_MEMORY_MESSAGE_CHAR_LIMIT]),
         )
-        conn.commit()
-        conn.close()
 
     def get_user_memories(self, chat_id: int, user_id: int, limit: int) -> list[str]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT note FROM user_memories
-            WHERE chat_id = ? AND subject_user_id = ?
-            ORDER BY id DESC LIMIT ?
-            """,
-            (chat_id, user_id, limit),
-        )
-        rows = cursor.fetchall()
-        conn.close()
-        return [row[0] for row in rows]
+        self.flush()
+        with self._read() as conn:
+            return list(map(_first_column, conn.execute(_SQL_GET_USER_MEMORIES, (chat_id, user_id, limit))))
+
+    def get_user_memories_bulk(
+        self, chat_id: int, user_ids: Sequence[int], limit: int
+    ) -> dict[int, list[str]]:
+        """Return up to ``limit`` newest notes for each user in one query."""
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return {}
+        sql = _SQL_GET_USER_MEMORIES_BULK.format(placeholders=", ".join("?" * len(user_ids)))
+        self.flush()
+        memories: dict[int, list[str]] = {}
+        with self._read() as conn:
+            for user_id, note in conn.execute(sql, (chat_id, *user_ids, limit)):
+                memories.setdefault(user_id, []).append(note)
+        return memories
 
     # Blocks ---------------------------------------------------------------
     def toggle_block(
@@ -421,166 +708,63 @@ class Database:
         blocked_id: int,
         personal_message: str | None = None,
     ) -> bool:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT id FROM blocks
-            WHERE chat_id = ? AND blocker_id = ? AND blocked_id = ?
-            """,
-            (chat_id, blocker_id, blocked_id),
-        )
-        existing = cursor.fetchone()
-
-        if existing:
-            cursor.execute(
-                """
-                DELETE FROM blocks
-                WHERE chat_id = ? AND blocker_id = ? AND blocked_id = ?
-                """,
-                (chat_id, blocker_id, blocked_id),
-            )
-            conn.commit()
-            conn.close()
+        with self._write_lock:
+            # Try the insert first: a returned id means the block is new,
+            # otherwise the row already existed and the toggle removes it.
+            inserted = self._write_conn.execute(
+                _SQL_INSERT_BLOCK, (chat_id, blocker_id, blocked_id, personal_message)
+            ).fetchone()
+            if inserted:
+                return True
+            self._write_conn.execute(_SQL_DELETE_BLOCK, (chat_id, blocker_id, blocked_id))
             return False
 
-        cursor.execute(
-            """
-            INSERT INTO blocks (chat_id, blocker_id, blocked_id, personal_message)
-            VALUES (?, ?, ?, ?)
-            """,
-            (chat_id, blocker_id, blocked_id, personal_message),
-        )
-        conn.commit()
-        conn.close()
-        return True
-
     def is_blocked(self, chat_id: int, blocker_id: int, blocked_id: int) -> tuple[bool, str | None]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT personal_message FROM blocks
-            WHERE chat_id = ? AND blocker_id = ? AND blocked_id = ?
-            """,
-            (chat_id, blocker_id, blocked_id),
-        )
-        result = cursor.fetchone()
-        conn.close()
+        with self._read() as conn:
+            result = conn.execute(_SQL_GET_BLOCK_MESSAGE, (chat_id, blocker_id, blocked_id)).fetchone()
         if result:
             return True, result[0]
         return False, None
 
     def get_chat_blocks(self, chat_id: int) -> list[tuple[int, int]]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT blocker_id, blocked_id FROM blocks WHERE chat_id = ?",
-            (chat_id,),
-        )
-        results = cursor.fetchall()
-        conn.close()
-        return results
+        with self._read() as conn:
+            return conn.execute(_SQL_GET_CHAT_BLOCKS, (chat_id,)).fetchall()
 
     def get_blocks_by_blocker(self, chat_id: int, blocker_id: int) -> list[int]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT blocked_id FROM blocks WHERE chat_id = ? AND blocker_id = ?",
-            (chat_id, blocker_id),
-        )
-        results = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return results
+        with self._read() as conn:
+            return list(map(_first_column, conn.execute(_SQL_GET_BLOCKS_BY_BLOCKER, (chat_id, blocker_id))))
 
     def toggle_global_block(self, chat_id: int, blocker_id: int, message: str | None = None) -> bool:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id FROM global_blocks WHERE chat_id = ? AND blocker_id = ?",
-            (chat_id, blocker_id),
-        )
-        row = cursor.fetchone()
-        if row:
-            cursor.execute(
-                "DELETE FROM global_blocks WHERE chat_id = ? AND blocker_id = ?",
-                (chat_id, blocker_id),
-            )
-            conn.commit()
-            conn.close()
+        with self._transaction():
+            inserted = self._write_conn.execute(_SQL_INSERT_GLOBAL_BLOCK, (chat_id, blocker_id, message)).fetchone()
+            if inserted:
+                self._write_conn.execute(_SQL_CLEAR_GLOBAL_BLOCK_EXCEPTIONS, (chat_id, blocker_id))
+                return True
+            self._write_conn.execute(_SQL_DELETE_GLOBAL_BLOCK, (chat_id, blocker_id))
             return False
 
-        cursor.execute(
-            "INSERT INTO global_blocks (chat_id, blocker_id, message) VALUES (?, ?, ?)",
-            (chat_id, blocker_id, message),
-        )
-        cursor.execute(
-            "DELETE FROM global_block_exceptions WHERE chat_id = ? AND blocker_id = ?",
-            (chat_id, blocker_id),
-        )
-        conn.commit()
-        conn.close()
-        return True
-
     def get_global_block(self, chat_id: int, blocker_id: int) -> tuple[bool, str | None]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT message FROM global_blocks WHERE chat_id = ? AND blocker_id = ?",
-            (chat_id, blocker_id),
-        )
-        row = cursor.fetchone()
-        conn.close()
+        with self._read() as conn:
+            row = conn.execute(_SQL_GET_GLOBAL_BLOCK, (chat_id, blocker_id)).fetchone()
         if row is None:
             return False, None
         return True, row[0]
 
     def toggle_global_block_exception(self, chat_id: int, blocker_id: int, allowed_id: int) -> bool:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT id FROM global_block_exceptions
-            WHERE chat_id = ? AND blocker_id = ? AND allowed_id = ?
-            """,
-            (chat_id, blocker_id, allowed_id),
-        )
-        row = cursor.fetchone()
-        if row:
-            cursor.execute(
-                """
-                DELETE FROM global_block_exceptions
-                WHERE chat_id = ? AND blocker_id = ? AND allowed_id = ?
-                """,
-                (chat_id, blocker_id, allowed_id),
-            )
-            conn.commit()
-            conn.close()
+        with self._write_lock:
+            inserted = self._write_conn.execute(
+                _SQL_INSERT_GLOBAL_BLOCK_EXCEPTION, (chat_id, blocker_id, allowed_id)
+            ).fetchone()
+            if inserted:
+                return True
+            self._write_conn.execute(_SQL_DELETE_GLOBAL_BLOCK_EXCEPTION, (chat_id, blocker_id, allowed_id))
             return False
 
-        cursor.execute(
-            """
-            INSERT INTO global_block_exceptions (chat_id, blocker_id, allowed_id)
-            VALUES (?, ?, ?)
-            """,
-            (chat_id, blocker_id, allowed_id),
-        )
-        conn.commit()
-        conn.close()
-        return True
-
     def is_global_block_exception(self, chat_id: int, blocker_id: int, allowed_id: int) -> bool:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT 1 FROM global_block_exceptions
-            WHERE chat_id = ? AND blocker_id = ? AND allowed_id = ?
-            """,
-            (chat_id, blocker_id, allowed_id),
-        )
-        result = cursor.fetchone()
-        conn.close()
+        with self._read() as conn:
+            result = conn.execute(
+                _SQL_IS_GLOBAL_BLOCK_EXCEPTION, (chat_id, blocker_id, allowed_id)
+            ).fetchone()
         return result is not None
 
     # Profiles -------------------------------------------------------------
@@ -590,111 +774,51 @@ class Database:
         user_id = getattr(user, "id", None)
         if user_id is None:
             return
-        conn = self.get_connection()
-        cursor = conn.cursor()
         username = getattr(user, "username", None)
         username_lower = username.lower() if username else None
         first_name = getattr(user, "first_name", None)
         last_name = getattr(user, "last_name", None)
-        cursor.execute(
-            """
-            INSERT INTO user_profiles (user_id, username, username_lower, first_name, last_name, updated_at)
-            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ON CONFLICT(user_id) DO UPDATE SET
-                username = excluded.username,
-                username_lower = excluded.username_lower,
-                first_name = excluded.first_name,
-                last_name = excluded.last_name,
-                updated_at = CURRENT_TIMESTAMP
-            """,
-            (user_id, username, username_lower, first_name, last_name),
-        )
-        conn.commit()
-        conn.close()
+        profile = (username, first_name, last_name)
+        with self._write_lock:
+            if self._profile_cache.get(user_id) == profile:
+                return
+            self._write_conn.execute(
+                _SQL_UPSERT_USER_PROFILE,
+                (user_id, username, username_lower, first_name, last_name),
+            )
+            self._profile_cache.put(user_id, profile)
 
-    def get_user_by_username(self, username: str) -> dict[str, Any] | None:
+    def get_user_by_username(self, username: str) -> UserRef | None:
         if not username:
             return None
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT user_id, first_name, username FROM user_profiles WHERE username_lower = ?",
-            (username.lower(),),
-        )
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return {"user_id": row[0], "first_name": row[1], "username": row[2]}
-        return None
+        with self._read() as conn:
+            row = conn.execute(_SQL_GET_USER_BY_USERNAME, (username.lower(),)).fetchone()
+        return UserRef._make(row) if row else None
 
     # Support --------------------------------------------------------------
     def can_send_support_message(self, user_id: int, cooldown_seconds: int = 30) -> tuple[bool, int]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
         current_time = int(time.time())
-
-        cursor.execute(
-            "SELECT last_message_time FROM last_support_time WHERE user_id = ?",
-            (user_id,),
-        )
-        result = cursor.fetchone()
-
-        if result:
-            last_time = result[0]
-            time_passed = current_time - last_time
-            if time_passed < cooldown_seconds:
-                conn.close()
-                return False, cooldown_seconds - time_passed
-
-        cursor.execute(
-            "INSERT OR REPLACE INTO last_support_time (user_id, last_message_time) VALUES (?, ?)",
-            (user_id, current_time),
-        )
-        conn.commit()
-        conn.close()
-        return True, 0
+        with self._write_lock:
+            # The UPSERT only overwrites once the cooldown has passed; no
+            # returned row means it is still running.
+            claimed = self._write_conn.execute(
+                _SQL_CLAIM_SUPPORT_SLOT, (user_id, current_time, cooldown_seconds)
+            ).fetchone()
+            if claimed:
+                return True, 0
+            last_time = self._write_conn.execute(_SQL_GET_LAST_SUPPORT_TIME, (user_id,)).fetchone()[0]
+            return False, cooldown_seconds - (current_time - last_time)
 
     def save_support_message(self, user_id: int, message: str) -> None:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO support_messages (user_id, message) VALUES (?, ?)",
-            (user_id, message),
-        )
-        conn.commit()
-        conn.close()
+        self._enqueue_write(_SQL_SAVE_SUPPORT_MESSAGE, (user_id, message))
 
     def get_support_ban(self, user_id: int) -> dict[str, bool] | None:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT block_media, block_all FROM support_bans WHERE user_id = ?",
-            (user_id,),
-        )
-        row = cursor.fetchone()
-        conn.close()
+        with self._read() as conn:
+            row = conn.execute(_SQL_GET_SUPPORT_BAN, (user_id,)).fetchone()
         if not row:
             return None
         return {"block_media": bool(row[0]), "block_all": bool(row[1])}
 
-    def _upsert_support_ban(self, user_id: int, block_media: int, block_all: int) -> None:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO support_bans (user_id, block_media, block_all)
-            VALUES (?, ?, ?)
-            ON CONFLICT(user_id) DO UPDATE SET
-                block_media = excluded.block_media,
-                block_all = excluded.block_all,
-                updated_at = CURRENT_TIMESTAMP
-            """,
-            (user_id, block_media, block_all),
-        )
-        conn.commit()
-        conn.close()
-
     def set_support_ban(
         self,
         user_id: int,
@@ -702,55 +826,56 @@ class Database:
         block_media: bool | None = None,
         block_all: bool | None = None,
     ) -> dict[str, bool]:
-        current = self.get_support_ban(user_id) or {"block_media": False, "block_all": False}
-        new_media = block_media if block_media is not None else current["block_media"]
-        new_all = block_all if block_all is not None else current["block_all"]
-        self._upsert_support_ban(user_id, int(new_media), int(new_all))
-        return {"block_media": new_media, "block_all": new_all}
+        # A NULL parameter keeps the stored flag; the named placeholders are
+        # reused in the UPDATE branch because excluded.* can't carry NULL here.
+        with self._write_lock:
+            row = self._write_conn.execute(
+                _SQL_SET_SUPPORT_BAN,
+                {
+                    "user_id": user_id,
+                    "block_media": None if block_media is None else int(block_media),
+                    "block_all": None if block_all is None else int(block_all),
+                },
+            ).fetchone()
+        return {"block_media": bool(row[0]), "block_all": bool(row[1])}
 
     def toggle_support_media_ban(self, user_id: int) -> bool:
-        current = self.get_support_ban(user_id) or {"block_media": False, "block_all": False}
-        new_state = not current["block_media"]
-        self._upsert_support_ban(user_id, int(new_state), int(current["block_all"]))
-        return new_state
+        with self._write_lock:
+            row = self._write_conn.execute(_SQL_TOGGLE_SUPPORT_MEDIA_BAN, (user_id,)).fetchone()
+        return bool(row[0])
 
     def toggle_support_full_ban(self, user_id: int) -> bool:
-        current = self.get_support_ban(user_id) or {"block_media": False, "block_all": False}
-        new_state = not current["block_all"]
-        self._upsert_support_ban(user_id, int(current["block_media"]), int(new_state))
-        return new_state
+        with self._write_lock:
+            row = self._write_conn.execute(_SQL_TOGGLE_SUPPORT_FULL_BAN, (user_id,)).fetchone()
+        return bool(row[0])
 
     # Stats ----------------------------------------------------------------
     def increment_swear(self, chat_id: int, user_id: int, amount: int = 1) -> None:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO swear_stats (chat_id, user_id, count)
-            VALUES (?, ?, ?)
-            ON CONFLICT(chat_id, user_id) DO UPDATE SET
-                count = count + excluded.count
-            """,
-            (chat_id, user_id, amount),
-        )
-        conn.commit()
-        conn.close()
+        with self._write_lock:
+            self._swear_buf[(chat_id, user_id)] += amount
 
     def get_swear_ranking(self, chat_id: int, limit: int) -> list[tuple[int, int]]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT user_id, count FROM swear_stats
-            WHERE chat_id = ?
-            ORDER BY count DESC, user_id ASC
-            LIMIT ?
-            """,
-            (chat_id, limit),
-        )
-        results = cursor.fetchall()
-        conn.close()
-        return results
+        self.flush()
+        with self._read() as conn:
+            return conn.execute(_SQL_GET_SWEAR_RANKING, (chat_id, limit)).fetchall()
+
+
+_db: Database | None = None
+_db_lock = threading.Lock()
+
+
+def get_db() -> Database:
+    """Return the shared Database, opening it on first use."""
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                _db = Database()
+    return _db
 
 
-db = Database()
+def __getattr__(name: str) -> Any:
+    # `db` used to be created at import time; keep it working lazily.
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
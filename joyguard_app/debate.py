@@ -2,10 +2,11 @@
 
 from __future__ import annotations
 
-import json
+import re
 import time
 from typing import Any, Iterable
 
+import orjson
 from aiogram import types
 
 from .openrouter import call_openrouter
@@ -32,18 +33,28 @@ DEBATE_SYSTEM_PROMPT = (
     " После списка добавь едкое резюме в одном предложении. confidence — число 0..1."
     " Не зови правила, не оправдывайся — тебе достаточно видеть идиотизм."
 )
+# Shared by every classifier request; call_openrouter only serialises it.
+_DEBATE_SYSTEM_MESSAGE: dict[str, str] = {"role": "system", "content": DEBATE_SYSTEM_PROMPT}
+
+# Cheap pre-filter: short messages without any of these stems (insults, "lies",
+# "nonsense", whining) or a burst of !?? almost never get a yes from the model,
+# so they skip the classifier call entirely.
+AUTO_DEBATE_TRIGGER_RE = re.compile(
+    r"\b(?:идиот|дура|дебил|туп|бред|чуш|ерунд|вр[её]шь|вру|вран|лож|лжё|обман|ною|ныть|плач|истер|бесит|ненавиж|заткн)"
+    r"|[!?]{3,}",
+    re.IGNORECASE,
+)
 
 
 def _parse_json_response(raw: str) -> dict[str, Any] | None:
     try:
-        return json.loads(raw)
-    except json.JSONDecodeError:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
         return None
 
 
 def _build_dialogue_context(chat_id: int) -> list[str]:
-    history = get_chat_history_entries(chat_id)
-    return history[-AUTO_DEBATE_HISTORY_LIMIT:]
+    return get_chat_history_entries(chat_id, AUTO_DEBATE_HISTORY_LIMIT)
 
 
 async def should_trigger_auto_debate(
@@ -67,23 +78,25 @@ async def should_trigger_auto_debate(
     if last_reply and now - last_reply < AUTO_DEBATE_COOLDOWN:
         return False, None
 
+    if len(text) < 2 * AUTO_DEBATE_MIN_TEXT_LENGTH and not AUTO_DEBATE_TRIGGER_RE.search(text):
+        return False, None
+
     dialogue = _build_dialogue_context(message.chat.id)
     serialized_targets = serialize_targets_for_prompt(list(targets or []))
 
     payload = [
-        {"role": "system", "content": DEBATE_SYSTEM_PROMPT},
+        _DEBATE_SYSTEM_MESSAGE,
         {
             "role": "user",
-            "content": json.dumps(
+            "content": orjson.dumps(
                 {
                     "chat_id": message.chat.id,
                     "user_id": message.from_user.id,
                     "text": text,
                     "dialogue": dialogue,
                     "targets": serialized_targets,
-                },
-                ensure_ascii=False,
-            ),
+                }
+            ).decode(),
         },
     ]
 
@@ -3,18 +3,19 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import random
 import re
-from collections import deque
+from collections import OrderedDict, deque
+from itertools import islice
 from typing import Any
 
+import orjson
 from aiogram import types
 
-from .database import db
+from .database import get_db
 from .openrouter import call_openrouter
 from .settings import (
-    CHAT_HISTORY_CHAR_LIMIT,
+    AUTO_DEBATE_HISTORY_LIMIT,
     CHAT_HISTORY_LIMIT,
     CHAT_MEMORY_CONTEXT_LIMIT,
     CHAT_MEMORY_MESSAGE_CHAR_LIMIT,
@@ -22,6 +23,7 @@ from .settings import (
     OPENROUTER_API_KEY,
     MAX_MEMORY_FACTS,
     MEMORY_CAPTURE_PROBABILITY,
+    MEMORY_FACT_DEDUP_SIZE,
     MEMORY_MIN_RECENT_SHARE,
     MEMORY_SUMMARY_PROMPT,
     USER_MEMORY_CONTEXT_LIMIT,
@@ -30,21 +32,38 @@ from .settings import (
     WORD_PATTERN,
 )
 
+# Enough entries for both the reply prompt and the auto-debate context.
+_HISTORY_MAXLEN = max(CHAT_HISTORY_LIMIT, AUTO_DEBATE_HISTORY_LIMIT)
+
+# Normalised facts recently stored per chat and per (chat, user), so a model
+# repeating itself across similar messages doesn't fill the tables with copies.
+_recent_chat_facts: dict[int, OrderedDict[str, None]] = {}
+_recent_user_facts: dict[tuple[int, int], OrderedDict[str, None]] = {}
+_rng = random.Random()
+# The event loop only keeps weak references to tasks; hold capture tasks
+# here until they finish so they can't be collected mid-flight.
+_capture_tasks: set[asyncio.Task[None]] = set()
+# Built once at import; extraction requests reuse it read-only.
+_MEMORY_SYSTEM_MESSAGE: dict[str, str] = {"role": "system", "content": MEMORY_SUMMARY_PROMPT}
+
 
 def store_chat_history(message: types.Message) -> None:
-    if message.chat.type not in {"group", "supergroup"}:
+    chat = message.chat
+    if chat.type not in {"group", "supergroup"}:
         return
-    if not message.from_user:
+    user = message.from_user
+    if not user:
         return
     content = message.text or message.caption
-    if not content:
+    if content:
+        content = content[:CHAT_MEMORY_MESSAGE_CHAR_LIMIT]
+    else:
         content = f"<{message.content_type}>"
-    author = (
-        message.from_user.full_name
-        or (f"@{message.from_user.username}" if message.from_user.username else str(message.from_user.id))
-    )
+    author = user.full_name or (f"@{user.username}" if user.username else str(user.id))
     entry = f"{author}: {content}"
-    history = chat_histories.setdefault(message.chat.id, deque(maxlen=CHAT_HISTORY_LIMIT))
+    history = chat_histories.get(chat.id)
+    if history is None:
+        history = chat_histories[chat.id] = deque(maxlen=_HISTORY_MAXLEN)
     history.append(entry)
 
 
@@ -57,11 +76,14 @@ async def should_capture_memory(message: types.Message) -> bool:
     return random.random() <= MEMORY_CAPTURE_PROBABILITY
 
 
-def get_chat_history_entries(chat_id: int) -> list[str]:
+def get_chat_history_entries(chat_id: int, limit: int | None = None) -> list[str]:
     history = chat_histories.get(chat_id)
     if not history:
         return []
-    return list(history)
+    if limit is None or len(history) <= limit:
+        return list(history)
+    # Copy just the tail instead of the whole deque.
+    return list(islice(history, len(history) - limit, None))
 
 
 def get_display_name(user: types.User | None) -> str:
@@ -76,11 +98,13 @@ def get_display_name(user: types.User | None) -> str:
 
 def build_user_memory_context(chat_id: int, targets: list[dict]) -> list[str]:
     context_lines: list[str] = []
+    target_ids = [target["user_id"] for target in targets if target.get("user_id")]
+    if not target_ids:
+        return context_lines
+    memories = get_db().get_user_memories_bulk(chat_id, target_ids, USER_MEMORY_CONTEXT_LIMIT)
     for target in targets:
         target_id = target.get("user_id")
-        if not target_id:
-            continue
-        notes = db.get_user_memories(chat_id, target_id, USER_MEMORY_CONTEXT_LIMIT)
+        notes = memories.get(target_id) if target_id else None
         if not notes:
             continue
         name = target.get("name") or (
@@ -93,36 +117,35 @@ def build_user_memory_context(chat_id: int, targets: list[dict]) -> list[str]:
 
 
 def serialize_targets_for_prompt(targets: list[dict]) -> list[dict[str, Any]]:
-    serialized = []
-    for target in targets:
-        if not target.get("user_id"):
-            continue
-        serialized.append(
-            {
-                "user_id": target["user_id"],
-                "name": target.get("name"),
-                "username": target.get("username"),
-            }
-        )
-    return serialized
+    return [
+        {"user_id": target["user_id"], "name": target.get("name"), "username": target.get("username")}
+        for target in targets
+        if target.get("user_id")
+    ]
 
 
 def choose_varied_entries(entries: list[str], limit: int) -> list[str]:
-    if limit <= 0 or len(entries) <= limit:
+    total = len(entries)
+    if limit <= 0 or total <= limit:
         return entries
-    recent_keep = entries[: max(MEMORY_MIN_RECENT_SHARE, min(limit // 2, len(entries)))]
-    remaining = entries[len(recent_keep) :]
-    to_pick = limit - len(recent_keep)
-    if remaining and to_pick > 0:
-        sampled = random.sample(remaining, min(to_pick, len(remaining)))
-        recent_keep += sampled
-    return recent_keep
+    keep = max(MEMORY_MIN_RECENT_SHARE, min(limit // 2, total))
+    to_pick = limit - keep
+    if to_pick <= 0 or keep >= total:
+        return entries[:keep]
+    # Sample indices rather than copying the tail just to draw from it.
+    picked = _rng.sample(range(keep, total), min(to_pick, total - keep))
+    return entries[:keep] + [entries[index] for index in picked]
 
 
 def summarize_message_text(message: types.Message) -> str:
-    text = (message.text or message.caption or "").strip()
+    text = message.text or message.caption
     if text:
-        return text[:CHAT_MEMORY_MESSAGE_CHAR_LIMIT]
+        # Telegram text usually arrives stripped and short; skip the copies then.
+        if len(text) <= CHAT_MEMORY_MESSAGE_CHAR_LIMIT and not (text[0].isspace() or text[-1].isspace()):
+            return text
+        text = text.strip()
+        if text:
+            return text[:CHAT_MEMORY_MESSAGE_CHAR_LIMIT]
     return f"<{message.content_type}>"
 
 
@@ -134,29 +157,37 @@ def normalize_message_text(value: str | None) -> str | None:
 
 
 async def extract_memory_facts(
-    message: types.Message, targets: list[dict]
+    message: types.Message,
+    targets: list[dict],
+    *,
+    author_id: int | None = None,
+    author_name: str | None = None,
 ) -> tuple[list[str], dict[int, list[str]]]:
     text = message.text or message.caption
     if not text or not OPENROUTER_API_KEY:
         return [], {}
 
+    # Callers that already resolved the author pass it in.
+    if author_name is None:
+        author = message.from_user
+        author_id = author.id if author else None
+        author_name = get_display_name(author)
     target_payload = serialize_targets_for_prompt(targets)
     payload = {
         "role": "user",
-        "content": json.dumps(
+        "content": orjson.dumps(
             {
                 "chat_id": message.chat.id,
-                "author_id": message.from_user.id if message.from_user else None,
-                "author_name": get_display_name(message.from_user),
+                "author_id": author_id,
+                "author_name": author_name,
                 "text": text,
                 "targets": target_payload,
-            },
-            ensure_ascii=False,
-        ),
+            }
+        ).decode(),
     }
     response = await call_openrouter(
         [
-            {"role": "system", "content": MEMORY_SUMMARY_PROMPT},
+            _MEMORY_SYSTEM_MESSAGE,
             payload,
         ],
         temperature=0.2,
@@ -165,15 +196,16 @@ async def extract_memory_facts(
     if not response:
         return [], {}
     try:
-        parsed = json.loads(response)
-    except json.JSONDecodeError:
+        parsed = orjson.loads(response)
+    except orjson.JSONDecodeError:
+        return [], {}
+    if not isinstance(parsed, dict):
         return [], {}
 
     chat_facts = []
-    if isinstance(parsed, dict):
-        for fact in (parsed.get("chat_facts") or [])[:MAX_MEMORY_FACTS]:
-            if isinstance(fact, str) and fact.strip():
-                chat_facts.append(fact.strip())
+    for fact in (parsed.get("chat_facts") or [])[:MAX_MEMORY_FACTS]:
+        if isinstance(fact, str) and fact.strip():
+            chat_facts.append(fact.strip())
     user_facts: dict[int, list[str]] = {}
     for entry in parsed.get("user_facts") or []:
         if not isinstance(entry, dict):
@@ -185,21 +217,64 @@ async def extract_memory_facts(
     return chat_facts, user_facts
 
 
+def _is_new_fact(recent: OrderedDict[str, None], fact: str) -> bool:
+    key = normalize_message_text(fact)
+    if not key:
+        return False
+    if key in recent:
+        recent.move_to_end(key)
+        return False
+    recent[key] = None
+    if len(recent) > MEMORY_FACT_DEDUP_SIZE:
+        recent.popitem(last=False)
+    return True
+
+
+def _persist_memories(
+    chat_id: int,
+    author_id: int | None,
+    author_name: str | None,
+    chat_entries: list[tuple[int | None, str]],
+    user_notes: list[tuple[int, str]],
+) -> None:
+    db = get_db()
+    for message_id, summary in chat_entries:
+        db.add_chat_memory(chat_id, message_id, author_id, author_name, summary)
+    for subject_id, note in user_notes:
+        db.add_user_memory(chat_id, subject_id, author_id, note)
+
+
 async def store_structured_memories(message: types.Message, targets: list[dict]) -> None:
     if message.chat.type not in {"group", "supergroup"}:
         return
     summary = summarize_message_text(message)
-    author_id = message.from_user.id if message.from_user else None
-    author_name = get_display_name(message.from_user)
-    db.add_chat_memory(message.chat.id, message.message_id, author_id, author_name, summary)
+    author = message.from_user
+    author_id = author.id if author else None
+    author_name = get_display_name(author)
+    chat_id = message.chat.id
+    # The summary is known up front: store it before the model call so it
+    # keeps message order and survives a slow or failed extraction.
+    await asyncio.to_thread(
+        _persist_memories, chat_id, author_id, author_name, [(message.message_id, summary)], []
+    )
 
-    chat_facts, user_facts = await extract_memory_facts(message, targets)
-    for fact in chat_facts:
-        db.add_chat_memory(message.chat.id, None, author_id, author_name, fact)
+    chat_entries: list[tuple[int | None, str]] = []
+    user_notes: list[tuple[int, str]] = []
+    try:
+        chat_facts, user_facts = await extract_memory_facts(
+            message, targets, author_id=author_id, author_name=author_name
+        )
+    except Exception as exc:
+        logger.warning("Memory fact extraction failed: %s", exc)
+        chat_facts, user_facts = [], {}
+    recent_chat = _recent_chat_facts.setdefault(chat_id, OrderedDict())
+    chat_entries.extend((None, fact) for fact in chat_facts if _is_new_fact(recent_chat, fact))
 
     for subject_id, notes in user_facts.items():
-        for note in notes[:MAX_MEMORY_FACTS]:
-            db.add_user_memory(message.chat.id, subject_id, author_id, note)
+        recent_user = _recent_user_facts.setdefault((chat_id, subject_id), OrderedDict())
+        user_notes.extend(
+            (subject_id, note) for note in notes[:MAX_MEMORY_FACTS] if _is_new_fact(recent_user, note)
+        )
 
     if not chat_facts and not user_facts and targets and (message.text or message.caption):
         for target in targets:
@@ -210,7 +285,14 @@ async def store_structured_memories(message: types.Message, targets: list[dict])
                 f"@{target.get('username')}" if target.get("username") else "этот пользователь"
             )
             note = f"{author_name} обычно заводит тему '{summary}' когда общается с {target_name}"
-            db.add_user_memory(message.chat.id, target_id, author_id, note)
+            if _is_new_fact(_recent_user_facts.setdefault((chat_id, target_id), OrderedDict()), note):
+                user_notes.append((target_id, note))
+
+    if not chat_entries and not user_notes:
+        return
+    # One hop to a worker thread for the whole batch keeps the lock (and the
+    # occasional prune) off the event loop.
+    await asyncio.to_thread(_persist_memories, chat_id, author_id, author_name, chat_entries, user_notes)
 
 
 async def schedule_memory_capture(message: types.Message, targets: list[dict]) -> None:
@@ -225,4 +307,6 @@ async def schedule_memory_capture(message: types.Message, targets: list[dict]) -
         except Exception as exc:
             logger.warning("Memory capture failed: %s", exc)
 
-    asyncio.create_task(_runner())
+    task = asyncio.create_task(_runner())
+    _capture_tasks.add(task)
+    task.add_done_callback(_capture_tasks.discard)
@@ -2,18 +2,85 @@
 
 from __future__ import annotations
 
-import json
+import asyncio
+from collections.abc import AsyncIterator
 
 import aiohttp
+import orjson
 
 from .settings import (
     AIOHTTP_TIMEOUT,
     OPENROUTER_API_KEY,
     OPENROUTER_API_URL,
+    OPENROUTER_MAX_CONCURRENCY,
+    OPENROUTER_MAX_RETRIES,
     OPENROUTER_MODEL,
+    OPENROUTER_RETRY_BASE_DELAY,
+    OPENROUTER_RETRY_MAX_DELAY,
     logger,
 )
 
+# One pooled session for the whole process, so requests reuse keep-alive
+# connections instead of paying a TCP+TLS handshake each time.
+_session: aiohttp.ClientSession | None = None
+# Caps in-flight requests across every caller (replies, memory capture, debate).
+_concurrency = asyncio.Semaphore(OPENROUTER_MAX_CONCURRENCY)
+
+
+def _get_session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            timeout=AIOHTTP_TIMEOUT,
+            connector=aiohttp.TCPConnector(limit=64, ttl_dns_cache=300, keepalive_timeout=60),
+            headers={
+                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+                "HTTP-Referer": "https://github.com/",
+                "X-Title": "SpringtrapSilent",
+            },
+        )
+    return _session
+
+
+async def close_openrouter_session() -> None:
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+def _retry_delay(response: aiohttp.ClientResponse, attempt: int) -> float:
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), OPENROUTER_RETRY_MAX_DELAY)
+        except ValueError:
+            pass  # HTTP-date form; fall back to exponential backoff
+    return _backoff_delay(attempt)
+
+
+def _backoff_delay(attempt: int) -> float:
+    return min(OPENROUTER_RETRY_BASE_DELAY * 2**attempt, OPENROUTER_RETRY_MAX_DELAY)
+
+
+def _has_api_key() -> bool:
+    if not OPENROUTER_API_KEY:
+        logger.error(
+            "OPENROUTER_API_KEY/GROK_API_KEY not provided. Set a valid key in your environment before enabling AI replies."
+        )
+        return False
+    return True
+
+
+def _log_api_error(status: int, response_text: str) -> None:
+    if status == 401:
+        logger.error(
+            "OpenRouter API error 401 (unauthorized). Make sure OPENROUTER_API_KEY/GROK_API_KEY contains a valid OpenRouter token registered to your account. Response: %s",
+            response_text,
+        )
+    else:
+        logger.error("OpenRouter API error %s: %s", status, response_text)
+
 
 async def call_openrouter(
     messages: list[dict[str, str]],
@@ -21,10 +88,7 @@ async def call_openrouter(
     temperature: float = 0.9,
     max_tokens: int = 400,
 ) -> str | None:
-    if not OPENROUTER_API_KEY:
-        logger.error(
-            "OPENROUTER_API_KEY/GROK_API_KEY not provided. Set a valid key in your environment before enabling AI replies."
-        )
+    if not _has_api_key():
         return None
 
     payload = {
@@ -33,28 +97,33 @@ async def call_openrouter(
         "temperature": temperature,
         "max_tokens": max_tokens,
     }
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://github.com/",
-        "X-Title": "SpringtrapSilent",
-    }
     try:
-        async with aiohttp.ClientSession(timeout=AIOHTTP_TIMEOUT) as session:
-            async with session.post(OPENROUTER_API_URL, json=payload, headers=headers) as response:
-                response_text = await response.text()
-                if response.status != 200:
-                    if response.status == 401:
-                        logger.error(
-                            "OpenRouter API error 401 (unauthorized). Make sure OPENROUTER_API_KEY/GROK_API_KEY contains a valid OpenRouter token registered to your account. Response: %s",
-                            response_text,
+        session = _get_session()
+        for attempt in range(OPENROUTER_MAX_RETRIES + 1):
+            try:
+                async with _concurrency, session.post(OPENROUTER_API_URL, json=payload) as response:
+                    if response.status == 200:
+                        data = orjson.loads(await response.read())
+                        break
+                    response_text = await response.text()
+                    # Rate limits and server errors are retried; anything else is final.
+                    if (response.status == 429 or response.status >= 500) and attempt < OPENROUTER_MAX_RETRIES:
+                        delay = _retry_delay(response, attempt)
+                        logger.warning(
+                            "OpenRouter API error %s, retrying in %.1fs: %s", response.status, delay, response_text
                         )
                     else:
-                        logger.error("OpenRouter API error %s: %s", response.status, response_text)
-                    return None
-                data = json.loads(response_text)
+                        _log_api_error(response.status, response_text)
+                        return None
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as exc:
+                # A dropped keep-alive connection or a timeout is as transient as a 503.
+                if attempt == OPENROUTER_MAX_RETRIES:
+                    raise
+                delay = _backoff_delay(attempt)
+                logger.warning("OpenRouter request failed, retrying in %.1fs: %r", delay, exc)
+            await asyncio.sleep(delay)
     except Exception as exc:  # pragma: no cover - network
-        logger.error("OpenRouter request failed: %s", exc)
+        logger.error("OpenRouter request failed: %r", exc)
         return None
 
     choices = data.get("choices") or []
@@ -63,3 +132,64 @@ async def call_openrouter(
     message = choices[0].get("message", {})
     content = message.get("content")
     return content.strip() if content else None
+
+
+async def stream_openrouter(
+    messages: list[dict[str, str]],
+    *,
+    temperature: float = 0.9,
+    max_tokens: int = 400,
+) -> AsyncIterator[str]:
+    """Yield reply text deltas as the model produces them (SSE).
+
+    Rate limits and server errors are retried like in call_openrouter, but
+    only until the first chunk arrives; a stream that breaks midway just
+    ends early.
+    """
+    if not _has_api_key():
+        return
+
+    payload = {
+        "model": OPENROUTER_MODEL,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "stream": True,
+    }
+    try:
+        session = _get_session()
+        for attempt in range(OPENROUTER_MAX_RETRIES + 1):
+            async with _concurrency, session.post(OPENROUTER_API_URL, json=payload) as response:
+                if response.status == 200:
+                    async for line in response.content:
+                        # Skip blank separators and ": keep-alive" comments.
+                        if not line.startswith(b"data:"):
+                            continue
+                        chunk = line[5:].strip()
+                        if chunk == b"[DONE]":
+                            return
+                        try:
+                            data = orjson.loads(chunk)
+                        except orjson.JSONDecodeError:
+                            continue
+                        if "error" in data:
+                            logger.error("OpenRouter stream error: %s", data["error"])
+                            return
+                        choices = data.get("choices") or []
+                        if choices:
+                            content = (choices[0].get("delta") or {}).get("content")
+                            if content:
+                                yield content
+                    return
+                response_text = await response.text()
+                if (response.status == 429 or response.status >= 500) and attempt < OPENROUTER_MAX_RETRIES:
+                    delay = _retry_delay(response, attempt)
+                    logger.warning(
+                        "OpenRouter API error %s, retrying in %.1fs: %s", response.status, delay, response_text
+                    )
+                else:
+                    _log_api_error(response.status, response_text)
+                    return
+            await asyncio.sleep(delay)
+    except Exception as exc:  # pragma: no cover - network
+        logger.error("OpenRouter stream failed: %s", exc)
@@ -4,11 +4,10 @@ from __future__ import annotations
 
 RULES_LAST_REQUEST_KEY = "rules_last_request"
 
-import re
 import time
 from typing import Any
 
-from .database import db
+from .database import get_db
 from .settings import (
     RULES_AUTO_REQUEST_COOLDOWN,
     RULES_CAPTURE_TIMEOUT,
@@ -17,28 +16,63 @@ from .settings import (
     pending_rules_requests,
 )
 
-RULE_LINE_RE = re.compile(r"^\s*(\d+(?:\.\d+)*|[•\*-])\s*[\).\:-]?\s*(.+)$")
+_RULE_BULLETS = frozenset("•*-")
+_RULE_MARKER_PUNCT = frozenset(").:-")
+
+# should_request_rules runs for every group message in chats without rules,
+# so both of its database lookups are remembered per chat. All writes go
+# through capture_rules_text / mark_rules_request, which keep these current.
+_chats_without_rules: set[int] = set()
+_last_request_cache: dict[int, int | None] = {}
+
+
+def _scan_line(line: str) -> tuple[str | None, str]:
+    """Split a stripped line into (marker, body); marker is None for plain text."""
+    # Marker: a dotted number ("1", "2.3") or a bullet, then optional ").:-".
+    end = len(line)
+    if line[0] in _RULE_BULLETS:
+        pos = 1
+    else:
+        pos = 0
+        while pos < end and line[pos].isdecimal():
+            pos += 1
+        if not pos:
+            return None, line
+        while pos + 1 < end and line[pos] == "." and line[pos + 1].isdecimal():
+            pos += 2
+            while pos < end and line[pos].isdecimal():
+                pos += 1
+    marker_end = pos
+    while pos < end and line[pos].isspace():
+        pos += 1
+    if pos < end and line[pos] in _RULE_MARKER_PUNCT:
+        pos += 1
+    while pos < end and line[pos].isspace():
+        pos += 1
+    if pos == end:
+        # A bare marker ("12", "3.") is text, not an empty rule.
+        return None, line
+    return line[:marker_end], line[pos:]
 
 
 def parse_rules_text(raw_text: str) -> list[dict[str, str]]:
-    rules: list[dict[str, str]] = []
     if not raw_text:
-        return rules
+        return []
 
+    # (id, fragments) pairs; continuation lines are joined once at the end.
+    rules: list[tuple[str, list[str]]] = []
     for line in raw_text.splitlines():
         stripped = line.strip()
         if not stripped:
             continue
-        match = RULE_LINE_RE.match(stripped)
-        if match:
-            number = match.group(1)
-            body = match.group(2).strip() or stripped
-            rules.append({"id": number, "text": body})
+        marker, body = _scan_line(stripped)
+        if marker is not None:
+            rules.append((marker, [body]))
         elif rules:
-            rules[-1]["text"] = f"{rules[-1]['text']} {stripped}".strip()
+            rules[-1][1].append(body)
         else:
-            rules.append({"id": f"R{len(rules) + 1}", "text": stripped})
-    return rules
+            rules.append(("R1", [stripped]))
+    return [{"id": rule_id, "text": " ".join(fragments)} for rule_id, fragments in rules]
 
 
 def _set_cache(chat_id: int, raw_text: str, parsed_rules: list[dict[str, str]]) -> None:
@@ -57,8 +91,11 @@ def load_rules(chat_id: int) -> dict[str, Any] | None:
     cached = get_cached_rules(chat_id)
     if cached:
         return cached
-    stored = db.get_chat_rules(chat_id)
+    if chat_id in _chats_without_rules:
+        return None
+    stored = get_db().get_chat_rules(chat_id)
     if not stored:
+        _chats_without_rules.add(chat_id)
         return None
     parsed = stored.get("parsed") or []
     raw = stored.get("raw_text") or ""
@@ -87,8 +124,9 @@ def cancel_rules_capture(chat_id: int) -> None:
 
 def capture_rules_text(chat_id: int, raw_text: str) -> list[dict[str, str]]:
     parsed = parse_rules_text(raw_text)
-    db.save_chat_rules(chat_id, raw_text, parsed)
+    get_db().save_chat_rules(chat_id, raw_text, parsed)
     _set_cache(chat_id, raw_text, parsed)
+    _chats_without_rules.discard(chat_id)
     cancel_rules_capture(chat_id)
     logger.info("Stored %s rules for chat %s", len(parsed), chat_id)
     return parsed
@@ -124,25 +162,28 @@ def has_rules(chat_id: int) -> bool:
 
 
 def _get_last_request_ts(chat_id: int) -> int | None:
-    value = db.get_chat_setting(chat_id, RULES_LAST_REQUEST_KEY)
-    if not value:
-        return None
+    if chat_id in _last_request_cache:
+        return _last_request_cache[chat_id]
+    value = get_db().get_chat_setting(chat_id, RULES_LAST_REQUEST_KEY)
     try:
-        return int(value)
+        last_ts = int(value) if value else None
     except (TypeError, ValueError):
-        return None
+        last_ts = None
+    _last_request_cache[chat_id] = last_ts
+    return last_ts
 
 
 def mark_rules_request(chat_id: int) -> None:
-    db.set_chat_setting(chat_id, RULES_LAST_REQUEST_KEY, str(int(time.time())))
+    now = int(time.time())
+    get_db().set_chat_setting(chat_id, RULES_LAST_REQUEST_KEY, str(now))
+    _last_request_cache[chat_id] = now
 
 
 def should_request_rules(chat_id: int) -> bool:
     if is_rules_capture_active(chat_id):
         return False
-    if has_rules(chat_id):
-        return False
+    # Inside the cooldown window (the common case) nothing else matters.
     last_ts = _get_last_request_ts(chat_id)
     if last_ts and time.time() - last_ts < RULES_AUTO_REQUEST_COOLDOWN:
         return False
-    return True
+    return not has_rules(chat_id)
@@ -49,6 +49,10 @@ OPENROUTER_API_KEY = (
 )
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
 OPENROUTER_MODEL = "x-ai/grok-4.1-fast"
+OPENROUTER_MAX_CONCURRENCY = int(os.getenv("OPENROUTER_MAX_CONCURRENCY", "16"))
+OPENROUTER_MAX_RETRIES = 3
+OPENROUTER_RETRY_BASE_DELAY = 1.0
+OPENROUTER_RETRY_MAX_DELAY = 10.0
 DEFAULT_AI_STYLE = "mean"
 CUSTOM_STYLE_KEY = "custom"
 AI_STYLE_PRESETS: dict[str, dict[str, str]] = {
@@ -124,6 +128,7 @@ MEMORY_SUMMARY_PROMPT = (
 MAX_MEMORY_FACTS = 3
 MEMORY_MIN_RECENT_SHARE = 1
 MEMORY_CAPTURE_PROBABILITY = 0.65
+MEMORY_FACT_DEDUP_SIZE = 256
 SUBSCRIPTION_CACHE_TTL_OK = 300
 SUBSCRIPTION_CACHE_TTL_FAIL = 30
 CUSTOM_STYLE_PROMPT_LIMIT = 600
@@ -146,6 +151,12 @@ BOT_USERNAME: str | None = None
 CHAT_HISTORY_LIMIT = 12
 CHAT_HISTORY_CHAR_LIMIT = 1800
 CHAT_MEMORY_DB_LIMIT = 120
+CHAT_MEMORY_PRUNE_INTERVAL = 64
+DB_READ_POOL_SIZE = 4
+DB_WRITE_FLUSH_INTERVAL = 0.1
+SWEAR_FLUSH_INTERVAL = 2.0
+SETTINGS_CACHE_SIZE = 4096
+PROFILE_CACHE_SIZE = 100_000
 CHAT_MEMORY_CONTEXT_LIMIT = 18
 USER_MEMORY_CONTEXT_LIMIT = 6
 CHAT_MEMORY_MESSAGE_CHAR_LIMIT = 420
@@ -153,7 +164,7 @@ chat_histories: dict[int, deque[str]] = {}
 subscription_cache: dict[int, tuple[bool, float]] = {}
 user_style_cache: dict[int, str | None] = {}
 user_custom_prompt_cache: dict[int, str | None] = {}
-saved_styles_cache: dict[int, list[dict[str, Any]]] = {}
+saved_styles_cache: dict[int, list[Any]] = {}
 active_saved_style_cache: dict[int, int | None] = {}
 auto_debate_last_reply: dict[int, float] = {}
 
@@ -2,9 +2,7 @@
 
 from __future__ import annotations
 
-from typing import Any
-
-from .database import db
+from .database import SavedStyle, get_db
 from .settings import (
     AI_STYLE_PRESETS,
     CUSTOM_STYLE_KEY,
@@ -21,6 +19,9 @@ from .settings import (
     user_style_cache,
 )
 
+# Style keys accepted as-is; saved styles are matched by prefix instead.
+_FIXED_STYLE_KEYS = frozenset(AI_STYLE_PRESETS) | {CUSTOM_STYLE_KEY}
+
 
 def is_saved_style_key(style_key: str | None) -> bool:
     return isinstance(style_key, str) and style_key.startswith(SAVED_STYLE_PREFIX)
@@ -35,110 +36,114 @@ def extract_saved_style_id(style_key: str | None) -> int | None:
         return None
 
 
+_STYLE_SETTING_KEYS = ("ai_style", "ai_style_saved_id", "ai_style_custom_prompt")
+
+
+def _load_style_settings(user_id: int) -> None:
+    """Fill all three per-user style caches from a single settings read."""
+    values = get_db().get_user_settings_bulk(user_id, _STYLE_SETTING_KEYS)
+    stored = values["ai_style"]
+    if stored in _FIXED_STYLE_KEYS or (stored is not None and stored.startswith(SAVED_STYLE_PREFIX)):
+        user_style_cache[user_id] = stored
+    else:
+        user_style_cache[user_id] = None
+    try:
+        active_saved_style_cache[user_id] = int(values["ai_style_saved_id"])
+    except (TypeError, ValueError):
+        active_saved_style_cache[user_id] = None
+    user_custom_prompt_cache[user_id] = values["ai_style_custom_prompt"]
+
+
 def get_user_style(user_id: int | None) -> str | None:
     if not user_id:
         return None
-    cached = user_style_cache.get(user_id)
-    if cached in AI_STYLE_PRESETS or cached == CUSTOM_STYLE_KEY or is_saved_style_key(cached):
-        return cached
-    stored = db.get_user_setting(user_id, "ai_style")
-    if stored in AI_STYLE_PRESETS or stored == CUSTOM_STYLE_KEY or is_saved_style_key(stored):
-        user_style_cache[user_id] = stored
-        return stored
-    user_style_cache[user_id] = None
-    return None
+    if user_id not in user_style_cache:
+        _load_style_settings(user_id)
+    return user_style_cache[user_id]
 
 
 def set_active_saved_style(user_id: int, style_id: int | None) -> None:
     active_saved_style_cache[user_id] = style_id
     if style_id is None:
-        db.delete_user_setting(user_id, "ai_style_saved_id")
+        get_db().delete_user_setting(user_id, "ai_style_saved_id")
     else:
-        db.set_user_setting(user_id, "ai_style_saved_id", str(style_id))
+        get_db().set_user_setting(user_id, "ai_style_saved_id", str(style_id))
 
 
 def get_active_saved_style_id(user_id: int | None) -> int | None:
     if not user_id:
         return None
-    if user_id in active_saved_style_cache:
-        return active_saved_style_cache[user_id]
-    stored = db.get_user_setting(user_id, "ai_style_saved_id")
-    if stored is None:
-        active_saved_style_cache[user_id] = None
-        return None
-    try:
-        value = int(stored)
-    except (TypeError, ValueError):
-        value = None
-    active_saved_style_cache[user_id] = value
-    return value
+    if user_id not in active_saved_style_cache:
+        _load_style_settings(user_id)
+    return active_saved_style_cache[user_id]
 
 
 def set_user_style(user_id: int, style_key: str, *, saved_style_id: int | None = None) -> None:
     user_style_cache[user_id] = style_key
-    db.set_user_setting(user_id, "ai_style", style_key)
+    get_db().set_user_setting(user_id, "ai_style", style_key)
     set_active_saved_style(user_id, saved_style_id)
 
 
 def reset_user_style(user_id: int) -> None:
     user_style_cache[user_id] = None
     user_custom_prompt_cache[user_id] = None
-    db.delete_user_setting(user_id, "ai_style")
-    db.delete_user_setting(user_id, "ai_style_custom_prompt")
+    get_db().delete_user_setting(user_id, "ai_style")
+    get_db().delete_user_setting(user_id, "ai_style_custom_prompt")
     set_active_saved_style(user_id, None)
 
 
 def get_user_custom_prompt(user_id: int | None) -> str | None:
     if not user_id:
         return None
-    if user_id in user_custom_prompt_cache:
-        return user_custom_prompt_cache[user_id]
-    value = db.get_user_setting(user_id, "ai_style_custom_prompt")
-    user_custom_prompt_cache[user_id] = value
-    return value
+    if user_id not in user_custom_prompt_cache:
+        _load_style_settings(user_id)
+    return user_custom_prompt_cache[user_id]
 
 
 def set_user_custom_prompt(user_id: int, prompt: str) -> None:
     cleaned = prompt.strip()
     trimmed = cleaned[:CUSTOM_STYLE_PROMPT_LIMIT]
     user_custom_prompt_cache[user_id] = trimmed
-    db.set_user_setting(user_id, "ai_style_custom_prompt", trimmed)
+    get_db().set_user_setting(user_id, "ai_style_custom_prompt", trimmed)
 
 
 def invalidate_saved_styles_cache(user_id: int) -> None:
     saved_styles_cache.pop(user_id, None)
 
 
-def get_saved_styles(user_id: int) -> list[dict[str, Any]]:
+def get_saved_styles(user_id: int) -> list[SavedStyle]:
     cached = saved_styles_cache.get(user_id)
     if cached is not None:
         return cached
-    styles = db.get_saved_styles(user_id)
+    styles = get_db().get_saved_styles(user_id)
     saved_styles_cache[user_id] = styles
     return styles
 
 
-def get_saved_style(user_id: int, style_id: int | None) -> dict[str, Any] | None:
+def get_saved_style(user_id: int, style_id: int | None) -> SavedStyle | None:
     if style_id is None:
         return None
+    loaded_now = saved_styles_cache.get(user_id) is None
     for style in get_saved_styles(user_id):
-        if style["id"] == style_id:
+        if style.id == style_id:
             return style
-    style = db.get_saved_style(user_id, style_id)
+    if loaded_now:
+        return None
+    # The cached list may predate the style; the next listing reloads it.
+    style = get_db().get_saved_style(user_id, style_id)
     if style:
         invalidate_saved_styles_cache(user_id)
-        saved_styles_cache[user_id] = db.get_saved_styles(user_id)
     return style
 
 
-def add_saved_style(user_id: int, name: str, prompt: str) -> dict[str, Any]:
-    style = db.add_saved_style(user_id, name, prompt)
+def add_saved_style(user_id: int, name: str, prompt: str) -> SavedStyle:
+    style = get_db().add_saved_style(user_id, name, prompt)
     invalidate_saved_styles_cache(user_id)
     return style
 
 
 def delete_saved_style(user_id: int, style_id: int) -> bool:
-    deleted = db.delete_saved_style(user_id, style_id)
+    deleted = get_db().delete_saved_style(user_id, style_id)
     if deleted:
         invalidate_saved_styles_cache(user_id)
     return deleted
@@ -146,12 +151,8 @@ def delete_saved_style(user_id: int, style_id: int) -> bool:
 
 def get_effective_ai_style(user_id: int | None, *, default: str) -> str:
     personal = get_user_style(user_id)
-    if personal == CUSTOM_STYLE_KEY:
-        return CUSTOM_STYLE_KEY
-    if is_saved_style_key(personal):
-        return personal
-    if personal in AI_STYLE_PRESETS:
-        return personal  # type: ignore[arg-type]
+    if personal in _FIXED_STYLE_KEYS or (personal is not None and personal.startswith(SAVED_STYLE_PREFIX)):
+        return personal  # type: ignore[return-value]
     return default
 
 
@@ -167,7 +168,7 @@ def validate_saved_style_name(name: str, user_id: int) -> tuple[bool, str | None
         return False, f"Сократи название до {CUSTOM_STYLE_NAME_MAX_LENGTH} символов."
     lowered = text.lower()
     for style in get_saved_styles(user_id):
-        if style["name"].lower() == lowered:
+        if style.name.lower() == lowered:
             return False, "У тебя уже есть стиль с таким именем."
     return True, None
 